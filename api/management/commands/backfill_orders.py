@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+import time
+
+from api.utils.shopify import init_shopify, iter_pages
+from api.utils.orders import index_orders
+
+ORDER_FIELDS = 'id,name,email,phone,created_at,updated_at,financial_status,fulfillment_status,line_items'
+
+class Command(BaseCommand):
+    help = 'Index every Shopify order for local order lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--created-at-min',
+            help='Only index orders created at or after this ISO 8601 timestamp',
+        )
+
+    def handle(self, *args, **options):
+        init_shopify()
+        started = time.perf_counter()
+        params = {'status': 'any', 'fields': ORDER_FIELDS}
+        if options['created_at_min']:
+            params['created_at_min'] = options['created_at_min']
+
+        indexed = 0
+        for page in iter_pages('orders', **params):
+            indexed += index_orders(page)
+            self.stdout.write(f"Indexed {indexed} orders...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} orders in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+import time
+
+from api.models import Product
+from api.utils.shopify import init_shopify
+from api.utils.catalog import iter_catalog_pages
+from api.utils.mirror import delete_products, upsert_products
+from api.views.store import catalog_cache
+
+class Command(BaseCommand):
+    help = 'Copy every Shopify product and variant into the local product mirror'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Delete mirrored products that no longer exist in Shopify',
+        )
+
+    def handle(self, *args, **options):
+        init_shopify()
+        started = time.perf_counter()
+        seen = set()
+
+        # All statuses: drafts and archived products are mirrored too, and the
+        # served catalog filters on status.
+        for page in iter_catalog_pages(full=True):
+            upsert_products(page)
+            seen.update(product["id"] for product in page)
+            self.stdout.write(f"Upserted {len(seen)} products...")
+
+        if options['prune']:
+            stale = set(Product.objects.values_list('id', flat=True)) - seen
+            if stale:
+                delete_products(stale)
+            self.stdout.write(f"Pruned {len(stale)} products no longer in Shopify")
+
+        catalog_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Mirrored {len(seen)} products in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import logging
+import time
+
+from api.utils.notifications import deliver_due_digest, deliver_due_notifications
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Deliver pending Discord notifications and digests from the outbox, retrying failed ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, checking for due notifications every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep when no more notifications are due (with --loop)',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            help='Notifications to deliver per pass (default NOTIFICATION_DELIVERY_BATCH)',
+        )
+
+    def handle(self, *args, **options):
+        batch = options['batch'] or settings.NOTIFICATION_DELIVERY_BATCH
+        if not options['loop']:
+            delivered = deliver_due_notifications(batch) + deliver_due_digest()
+            self.stdout.write(self.style.SUCCESS(f"Processed {delivered} notifications"))
+            return
+
+        self.stdout.write(f"Delivering notifications every {options['interval']}s")
+        while True:
+            close_old_connections()
+            try:
+                processed = deliver_due_notifications(batch)
+                deliver_due_digest()
+            except Exception as e:
+                logger.error(f"Error delivering notifications: {str(e)}")
+                processed = 0
+            # A full batch means more are probably due; go again straight away
+            if processed < batch:
+                time.sleep(options['interval'])
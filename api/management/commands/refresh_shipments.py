@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import logging
+import time
+
+from api.utils.shipments import refresh_due_shipments
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Poll carriers for shipments that are due a tracking check'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, checking for due shipments every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=30,
+            help='Seconds to sleep when no more shipments are due (with --loop)',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            help='Shipments to check per pass (default TRACKING_REFRESH_BATCH)',
+        )
+
+    def handle(self, *args, **options):
+        batch = options['batch'] or settings.TRACKING_REFRESH_BATCH
+        if not options['loop']:
+            refreshed = self.refresh(batch)
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} shipments"))
+            return
+
+        self.stdout.write(f"Refreshing shipments every {options['interval']}s")
+        while True:
+            close_old_connections()
+            try:
+                refreshed = self.refresh(batch)
+            except Exception as e:
+                logger.error(f"Error refreshing shipments: {str(e)}")
+                refreshed = 0
+            # A full batch means more are probably due; go again straight away
+            if refreshed < batch:
+                time.sleep(options['interval'])
+
+    def refresh(self, batch):
+        started = time.perf_counter()
+        refreshed = refresh_due_shipments(batch)
+        if refreshed:
+            self.stdout.write(f"Checked {refreshed} shipments in {time.perf_counter() - started:.1f}s")
+        return refreshed
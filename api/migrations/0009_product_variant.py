@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_googlecalendarcredentials'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('body_html', models.TextField(blank=True, default='')),
+                ('vendor', models.CharField(blank=True, default='', max_length=255)),
+                ('product_type', models.CharField(blank=True, default='', max_length=255)),
+                ('tags', models.TextField(blank=True, default='')),
+                ('handle', models.CharField(db_index=True, max_length=255)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('draft', 'Draft'), ('archived', 'Archived')], default='active', max_length=8)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('shopify_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='api_product_status_id_idx'), models.Index(fields=['shopify_updated_at'], name='api_product_updated_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Variant',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('sku', models.CharField(blank=True, db_index=True, default='', max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('compare_at_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('position', models.IntegerField(default=1)),
+                ('inventory_item_id', models.BigIntegerField(blank=True, null=True, unique=True)),
+                ('inventory_quantity', models.IntegerField(default=0)),
+                ('requires_shipping', models.BooleanField(default=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='api.product')),
+            ],
+            options={
+                'ordering': ['product', 'position', 'id'],
+                'indexes': [models.Index(fields=['product', 'position'], name='api_variant_product_pos_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_product_variant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shopify_id', models.BigIntegerField(unique=True)),
+                ('order_number', models.CharField(max_length=32, unique=True)),
+                ('email', models.CharField(blank=True, db_index=True, default='', max_length=254)),
+                ('phone_digits', models.CharField(blank=True, default='', max_length=32)),
+                ('phone_suffix', models.CharField(blank=True, db_index=True, default='', max_length=10)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('summary', models.JSONField(default=dict)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Order index',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
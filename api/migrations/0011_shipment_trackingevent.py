@@ -0,0 +1,57 @@
+# Generated by Django 5.0.1 on 2026-10-17 21:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_orderindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Shipment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tracking_number', models.CharField(max_length=64, unique=True)),
+                ('tracking_url', models.URLField(blank=True, default='', max_length=1000)),
+                ('tracking_company', models.CharField(blank=True, default='', max_length=100)),
+                ('carrier', models.CharField(blank=True, default='', max_length=20)),
+                ('shopify_order_id', models.BigIntegerField(blank=True, null=True)),
+                ('order_number', models.CharField(blank=True, db_index=True, default='', max_length=32)),
+                ('fulfillment_id', models.BigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_transit', 'In transit'), ('delivered', 'Delivered'), ('unknown', 'Unknown'), ('error', 'Error')], default='pending', max_length=10)),
+                ('last_event', models.JSONField(blank=True, null=True)),
+                ('eta', models.CharField(blank=True, default='', max_length=64)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_checked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True)),
+                ('next_check_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrackingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=500)),
+                ('location', models.CharField(blank=True, default='', max_length=255)),
+                ('time', models.CharField(blank=True, default='', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in_transit', 'In transit'), ('delivered', 'Delivered'), ('unknown', 'Unknown'), ('error', 'Error')], max_length=10)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.shipment')),
+            ],
+            options={
+                'ordering': ['-recorded_at', '-id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trackingevent',
+            constraint=models.UniqueConstraint(fields=('shipment', 'description', 'time'), name='api_trackingevent_unique_scan'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_notification_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('key', models.CharField(max_length=250, primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=32)),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:31
+
+from django.db import migrations, models
+
+
+def mark_untracked(apps, schema_editor):
+    Shipment = apps.get_model('api', 'Shipment')
+    Shipment.objects.filter(tracking_url='', status='pending').update(status='untracked')
+
+
+def mark_pending(apps, schema_editor):
+    Shipment = apps.get_model('api', 'Shipment')
+    Shipment.objects.filter(status='untracked').update(status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_cachegeneration'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shipment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('untracked', 'Untracked'), ('in_transit', 'In transit'), ('delivered', 'Delivered'), ('unknown', 'Unknown'), ('error', 'Error')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='trackingevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('untracked', 'Untracked'), ('in_transit', 'In transit'), ('delivered', 'Delivered'), ('unknown', 'Unknown'), ('error', 'Error')], max_length=10),
+        ),
+        migrations.RunPython(mark_untracked, mark_pending),
+    ]
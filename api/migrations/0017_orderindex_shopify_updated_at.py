@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-17 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_deletedproduct'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='orderindex',
+            name='phone_suffix',
+        ),
+        migrations.AddField(
+            model_name='orderindex',
+            name='shopify_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
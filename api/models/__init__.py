@@ -1,4 +1,9 @@
 from .issue import Issue
 from .product_idea import ProductIdea
+from .product import Product, Variant, DeletedProduct
+from .order_index import OrderIndex
+from .shipment import Shipment, TrackingEvent
+from .notification import Notification
+from .cache_generation import CacheGeneration
 
-__all__ = ['Issue', 'ProductIdea'] 
\ No newline at end of file
+__all__ = ['Issue', 'ProductIdea', 'Product', 'Variant', 'DeletedProduct', 'OrderIndex', 'Shipment', 'TrackingEvent', 'Notification', 'CacheGeneration']
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.db import models
+
+class CacheGeneration(models.Model):
+    """
+    Current generation of a TieredCache key (see api.utils.cache).
+
+    Kept out of the shared cache table so culling can't drop it. Each write
+    stores a fresh random token rather than a counter, so a generation is
+    never reused, even if its row is pruned and the key written again.
+    """
+    key = models.CharField(max_length=250, primary_key=True)
+    token = models.CharField(max_length=32)
+    # When the value written with this token expires (a deletion, after a retention
+    # period); rows past it can be pruned
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.token}"
@@ -0,0 +1,32 @@
+from django.db import models
+
+class Notification(models.Model):
+    """
+    Outbox row for a Discord message, delivered by api.utils.notifications.
+
+    Rows are written in the same transaction as whatever they announce, so a
+    notification exists exactly when its issue or idea does. next_attempt_at
+    is when a worker may next try to deliver it (for digest notifications,
+    the end of their digest window); it is cleared once the message is
+    delivered or has used up its attempts.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('failed', 'Failed'),  # gave up after NOTIFICATION_MAX_ATTEMPTS
+    ]
+
+    payload = models.JSONField()  # Discord execute-webhook body: {content, embeds}
+    digest = models.BooleanField(default=False)  # sent with others in the next digest
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.status} notification {self.pk}"
@@ -0,0 +1,24 @@
+from django.db import models
+
+class OrderIndex(models.Model):
+    """
+    Local index of Shopify orders for lookups by order number and contact details.
+
+    `summary` holds the order exactly as the lookup endpoint serves it, so a
+    hit needs no Shopify call.
+    """
+    shopify_id = models.BigIntegerField(unique=True)
+    order_number = models.CharField(max_length=32, unique=True)  # Shopify name without '#'
+    email = models.CharField(max_length=254, blank=True, default='', db_index=True)  # lowercased
+    phone_digits = models.CharField(max_length=32, blank=True, default='')
+    created_at = models.DateTimeField(null=True, blank=True)
+    shopify_updated_at = models.DateTimeField(null=True, blank=True)
+    summary = models.JSONField(default=dict)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'Order index'
+
+    def __str__(self):
+        return f"#{self.order_number}"
@@ -0,0 +1,68 @@
+from django.db import models
+
+class Product(models.Model):
+    """Local mirror of a Shopify product, keyed by its Shopify id"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('draft', 'Draft'),
+        ('archived', 'Archived'),
+    ]
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    body_html = models.TextField(blank=True, default='')
+    vendor = models.CharField(max_length=255, blank=True, default='')
+    product_type = models.CharField(max_length=255, blank=True, default='')
+    tags = models.TextField(blank=True, default='')  # Shopify's comma-separated string
+    handle = models.CharField(max_length=255, db_index=True)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default='active')
+    published_at = models.DateTimeField(null=True, blank=True)
+    shopify_updated_at = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The served catalog is "active products in id order"
+            models.Index(fields=['status', 'id'], name='api_product_status_id_idx'),
+            models.Index(fields=['shopify_updated_at'], name='api_product_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class Variant(models.Model):
+    """Local mirror of a Shopify product variant"""
+    id = models.BigIntegerField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
+    title = models.CharField(max_length=255)
+    sku = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    compare_at_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    position = models.IntegerField(default=1)
+    inventory_item_id = models.BigIntegerField(null=True, blank=True, unique=True)
+    inventory_quantity = models.IntegerField(default=0)
+    requires_shipping = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['product', 'position', 'id']
+        indexes = [
+            models.Index(fields=['product', 'position'], name='api_variant_product_pos_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.title}"
+
+class DeletedProduct(models.Model):
+    """
+    Tombstone of a product removed from the mirror.
+
+    Shopify may deliver a products/update after the products/delete that
+    followed it; updates from before deleted_at are ignored so they can't
+    bring the product back.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    deleted_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.id} (deleted {self.deleted_at})"
@@ -0,0 +1,61 @@
+from django.db import models
+
+class Shipment(models.Model):
+    """
+    A tracked parcel from a Shopify fulfillment, kept up to date by the refresh_shipments command.
+
+    next_check_at is when the refresher should next poll the carrier; it is
+    cleared once the parcel is delivered (or too old to keep polling), and
+    never set for shipments without a tracking URL.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),  # not checked yet
+        ('untracked', 'Untracked'),  # no tracking URL to check
+        ('in_transit', 'In transit'),
+        ('delivered', 'Delivered'),
+        ('unknown', 'Unknown'),
+        ('error', 'Error'),
+    ]
+
+    tracking_number = models.CharField(max_length=64, unique=True)
+    tracking_url = models.URLField(max_length=1000, blank=True, default='')
+    tracking_company = models.CharField(max_length=100, blank=True, default='')
+    carrier = models.CharField(max_length=20, blank=True, default='')  # extractor that parsed the page
+    shopify_order_id = models.BigIntegerField(null=True, blank=True)
+    order_number = models.CharField(max_length=32, blank=True, default='', db_index=True)
+    fulfillment_id = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    last_event = models.JSONField(null=True, blank=True)
+    eta = models.CharField(max_length=64, blank=True, default='')
+    failures = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_checked_at = models.DateTimeField(null=True, blank=True)
+    last_changed_at = models.DateTimeField(null=True, blank=True)
+    next_check_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.tracking_number
+
+class TrackingEvent(models.Model):
+    """A carrier scan seen while polling a shipment; time is as the carrier reported it"""
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='events')
+    description = models.CharField(max_length=500)
+    location = models.CharField(max_length=255, blank=True, default='')
+    time = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=10, choices=Shipment.STATUS_CHOICES)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-recorded_at', '-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['shipment', 'description', 'time'], name='api_trackingevent_unique_scan',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.shipment}: {self.description}"
+
@@ -0,0 +1,26 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON: one object per line.
+
+    Lists render as one line per item and anything else as a single line.
+    Views that stream check `request.accepted_renderer.format == 'ndjson'`
+    and return a StreamingHttpResponse of ndjson_line() chunks instead.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return b''.join(ndjson_line(item) for item in items)
+
+
+def ndjson_line(item):
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
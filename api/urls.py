@@ -5,9 +5,11 @@ from django.http import JsonResponse
 from api.views import (
     IssueViewSet,
     ProductIdeaViewSet,
-    StoreViewSet
+    StoreViewSet,
+    MetricsViewSet
 )
 from api.views.health import health_check
+from api.views.webhooks import shopify_webhook
 from version import VERSION
 from .views import calendar
 
@@ -24,10 +26,12 @@ router.register(r'issues', IssueViewSet)
 router.register(r'product-ideas', ProductIdeaViewSet)
 router.register(r'store', StoreViewSet, basename='store')
 router.register(r'calendar', calendar.CalendarViewSet, basename='calendar')
+router.register(r'metrics', MetricsViewSet, basename='metrics')
 
 # The API routes should all be under /api/
 urlpatterns = [
     path('api/', api_root, name='api-root'),
     path('api/health/', health_check, name='health-check'),
+    path('api/webhooks/shopify/', shopify_webhook, name='shopify-webhook'),
     path('api/', include(router.urls)),
 ] 
\ No newline at end of file
@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.utils import timezone
+
+from api.models import CacheGeneration
+from api.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Seconds between sweeps of generation rows whose values have expired
+GENERATION_PRUNE_INTERVAL = 60 * 60
+# Seconds a deleted key's generation is kept. Longer than any value cached
+# under a generation (e.g. the calendar responses versioned by one), so
+# none of them outlives it.
+DELETED_GENERATION_RETENTION = 24 * 60 * 60
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+def key_lock(key):
+    """Return the process-wide lock guarding refreshes of a cache key"""
+    with _key_locks_guard:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+class TieredCache:
+    """
+    A small in-process L1 in front of the shared L2 cache.
+
+    Every write of a key stores a new random generation token in its
+    CacheGeneration row and with the value in L2. Workers keep values in L1
+    together with the generation they were read at, and re-check the
+    generation at most every `generation_ttl` seconds, so a value written by
+    any worker or machine replaces everyone's L1 copy within that window
+    without each read going to L2.
+
+    The generation row is locked for the write, so concurrent writers of a
+    key take turns and the value left in L2 is the one written with the
+    current generation. Generations live outside the L2 table because its
+    culling would drop them, and are tokens rather than counters so one is
+    never handed out twice.
+
+    Values are kept in L1 by reference (no pickling), so callers must treat
+    cached objects as immutable.
+    """
+
+    def __init__(self, l2_alias='shared', l1_max_entries=256, generation_ttl=2):
+        self.l2_alias = l2_alias
+        self.l1_max_entries = l1_max_entries
+        self.generation_ttl = generation_ttl
+        self._l1 = OrderedDict()
+        self._generations = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def get(self, key, default=None):
+        generation = self.generation(key)
+        now = time.time()
+
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None and entry[0] == generation and (entry[1] is None or entry[1] > now):
+                self._l1.move_to_end(key)
+                metrics.incr('cache.l1.hits')
+                return entry[2]
+        metrics.incr('cache.l1.misses')
+
+        stored = self.l2.get(self._value_key(key), _MISSING)
+        if stored is _MISSING:
+            metrics.incr('cache.l2.misses')
+            return default
+        metrics.incr('cache.l2.hits')
+
+        stored_generation, expires_at, value = stored
+        self._remember(key, stored_generation, expires_at, value)
+        return value
+
+    def set(self, key, value, timeout=None):
+        """Store value in L2 under a new generation and in this worker's L1"""
+        expires_at = time.time() + timeout if timeout is not None else None
+        with transaction.atomic():
+            generation = self._bump_generation(key, expires_at)
+            self.l2.set(self._value_key(key), (generation, expires_at, value), timeout=timeout)
+        self._remember(key, generation, expires_at, value)
+        self._prune_generations()
+
+    def set_many(self, values, timeout=None):
+        for key, value in values.items():
+            self.set(key, value, timeout=timeout)
+
+    def delete(self, key):
+        with transaction.atomic():
+            self._bump_generation(key, time.time() + DELETED_GENERATION_RETENTION)
+            self.l2.delete(self._value_key(key))
+        with self._lock:
+            self._l1.pop(key, None)
+
+    def generation(self, key):
+        """Return the current generation of key (None if never written), re-read every generation_ttl seconds"""
+        now = time.time()
+        with self._lock:
+            cached = self._generations.get(key)
+            if cached is not None and cached[1] > now:
+                self._generations.move_to_end(key)
+                return cached[0]
+
+        generation = CacheGeneration.objects.filter(key=key).values_list('token', flat=True).first()
+        self._remember_generation(key, generation)
+        return generation
+
+    def _bump_generation(self, key, expires_at=None):
+        """
+        Store a new generation for key and return it. Call inside a
+        transaction: the row stays locked until it commits.
+        """
+        generation = uuid.uuid4().hex
+        CacheGeneration.objects.update_or_create(key=key, defaults={
+            'token': generation,
+            'expires_at': datetime.fromtimestamp(expires_at, tz=dt_timezone.utc) if expires_at is not None else None,
+        })
+        self._remember_generation(key, generation)
+        return generation
+
+    def _remember_generation(self, key, generation):
+        # Capped like L1: a forgotten generation is just re-read on next use
+        with self._lock:
+            self._generations[key] = (generation, time.time() + self.generation_ttl)
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.l1_max_entries:
+                self._generations.popitem(last=False)
+
+    def _prune_generations(self):
+        """
+        Drop generation rows whose values have expired, at most every
+        GENERATION_PRUNE_INTERVAL seconds. A pruned key's next write gets a
+        fresh token, so nothing cached under the old one comes back.
+        """
+        now = time.time()
+        with self._lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + GENERATION_PRUNE_INTERVAL
+        CacheGeneration.objects.filter(expires_at__lt=timezone.now()).delete()
+
+    def _remember(self, key, generation, expires_at, value):
+        with self._lock:
+            self._l1[key] = (generation, expires_at, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    @staticmethod
+    def _value_key(key):
+        return f'{key}:value'
+
+
+tiered_cache = TieredCache(
+    l1_max_entries=settings.CACHE_L1_MAX_ENTRIES,
+    generation_ttl=settings.CACHE_GENERATION_TTL,
+)
+metrics.register_gauge('cache.l1.entries', lambda: len(tiered_cache._l1))
+
+
+class StaleWhileRevalidate:
+    """
+    Serve a cached value while at most one refresh per key runs in this process.
+
+    Entries younger than `soft_ttl` are served as-is. Older entries are still
+    served (marked 'stale') and trigger a single background refresh. Entries are
+    dropped from the cache after `hard_ttl`; only then does a caller wait on the
+    loader, and concurrent callers wait on that same load instead of starting
+    their own.
+    """
+
+    def __init__(self, key, loader, soft_ttl, hard_ttl, store=tiered_cache, source='origin'):
+        self.key = key
+        self.loader = loader
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.store = store
+        self.source = source
+        self._rerun = False
+
+    def get(self):
+        """Return (value, source) where source is 'cache', 'stale' or self.source"""
+        entry = self.store.get(self.key)
+        if entry is not None:
+            if time.time() - entry['fetched_at'] < self.soft_ttl:
+                return entry['value'], 'cache'
+            self.refresh_in_background()
+            return entry['value'], 'stale'
+
+        with key_lock(self.key):
+            # Another thread may have filled the cache while we waited
+            entry = self.store.get(self.key)
+            if entry is not None:
+                return entry['value'], 'cache'
+            return self._load(), self.source
+
+    def refresh_in_background(self, rerun=False):
+        """
+        Start a background refresh unless one is already running.
+
+        With rerun=True the caller knows the source changed, so a refresh that
+        is already running loads once more when it finishes instead of
+        possibly missing the change.
+        """
+        if rerun:
+            self._rerun = True
+        lock = key_lock(self.key)
+        if not lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                while True:
+                    self._rerun = False
+                    self._load()
+                    if not self._rerun:
+                        break
+            except Exception:
+                logger.exception("Background refresh of %s failed; serving stale data", self.key)
+            finally:
+                lock.release()
+                # Connections are per thread; this one's would otherwise stay open until collected
+                connections.close_all()
+
+        threading.Thread(target=run, name=f'refresh-{self.key}', daemon=True).start()
+        return True
+
+    def invalidate(self):
+        self.store.delete(self.key)
+
+    def _load(self):
+        value = self.loader()
+        self.store.set(self.key, {'value': value, 'fetched_at': time.time()}, timeout=self.hard_ttl)
+        return value
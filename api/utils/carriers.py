@@ -0,0 +1,272 @@
+"""
+Structured extraction of parcel status from carrier tracking pages.
+
+Each carrier registers an extractor for its hosts. An extractor gets the
+page HTML and returns {status, last_event, eta}, or None when the page has
+none of the markup it knows, in which case the generic extractor is tried.
+Extractors read only what they need: HTML targets are matched by class
+with a streaming parser that stops as soon as they have been found, and
+embedded JSON-LD is decoded straight out of its <script> tag.
+
+Only carriers whose tracking pages are rendered server-side can have an
+extractor. UPS, FedEx and DHL render tracking in the browser, so their
+pages fall through to the generic extractor; their parcels are reported
+delivered from the fulfillment's shipment_status instead (see
+api.utils.shipments).
+
+status is one of 'delivered', 'in_transit' or 'unknown'. last_event is
+{description, location, time} for the most recent scan, and eta is the
+estimated delivery; times are passed through as the carrier reports them.
+"""
+from html.parser import HTMLParser
+import json
+import re
+from urllib.parse import urlparse
+
+DELIVERED_RE = re.compile(r'\bdelivered\b', re.IGNORECASE)
+IN_TRANSIT_RE = re.compile(
+    r'in transit|out for delivery|on its way|shipped|departed|arrived at|picked up|label created',
+    re.IGNORECASE,
+)
+
+# Visible text the generic extractor reads before giving up
+GENERIC_TEXT_LIMIT = 50_000
+
+VOID_TAGS = frozenset({
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'source', 'track', 'wbr',
+})
+
+# Host -> (carrier, extractor); see register_carrier()
+CARRIER_EXTRACTORS = {}
+
+
+def classify_tracking_text(text):
+    """Guess a parcel's status from a piece of tracking page text"""
+    if DELIVERED_RE.search(text):
+        return 'delivered'
+    if IN_TRANSIT_RE.search(text):
+        return 'in_transit'
+    return 'unknown'
+
+
+def register_carrier(carrier, *hosts):
+    """Register the decorated function as the extractor for pages on hosts (and their subdomains)"""
+    def decorator(extractor):
+        for host in hosts:
+            CARRIER_EXTRACTORS[host] = (carrier, extractor)
+        return extractor
+    return decorator
+
+
+def carrier_for(url):
+    """Return (carrier, extractor) for a tracking URL, or None if no carrier claims its host"""
+    host = (urlparse(url).hostname or '').lower()
+    parts = host.split('.')
+    for i in range(len(parts) - 1):
+        match = CARRIER_EXTRACTORS.get('.'.join(parts[i:]))
+        if match is not None:
+            return match
+    return None
+
+
+def extract_tracking(url, html):
+    """Extract {carrier, status, last_event, eta} from the tracking page at url"""
+    match = carrier_for(url)
+    if match is not None:
+        carrier, extractor = match
+        result = extractor(html)
+        if result is not None:
+            return {'carrier': carrier, **result}
+    return {'carrier': None, **extract_generic(html)}
+
+
+def tracking_result(status, last_event=None, eta=None):
+    return {'status': status, 'last_event': last_event, 'eta': eta}
+
+
+def tracking_event(description, location=None, time=None):
+    if not description:
+        return None
+    return {'description': description, 'location': location or None, 'time': time or None}
+
+
+class _Done(Exception):
+    pass
+
+
+class _TargetParser(HTMLParser):
+    """
+    Collect the text of the first element carrying each target class.
+
+    Raises _Done once every target has been collected, or when an element
+    with one of the stop_at classes starts.
+    """
+
+    def __init__(self, targets, stop_at=()):
+        super().__init__()
+        self.targets = targets
+        self.stop_at = frozenset(stop_at)
+        self.found = {}
+        self.active = []  # [name, tag, open tags with that name, text parts]
+
+    def handle_starttag(self, tag, attrs):
+        for capture in self.active:
+            if capture[1] == tag:
+                capture[2] += 1
+        classes = None
+        for attr, value in attrs:
+            if attr == 'class' and value:
+                classes = value.split()
+                break
+        if not classes:
+            return
+        if self.stop_at.intersection(classes):
+            raise _Done
+        for name, cls in self.targets.items():
+            if cls in classes and name not in self.found and not any(c[0] == name for c in self.active):
+                if tag in VOID_TAGS:
+                    self.found[name] = ''
+                else:
+                    self.active.append([name, tag, 1, []])
+
+    def handle_endtag(self, tag):
+        for capture in list(self.active):
+            if capture[1] == tag:
+                capture[2] -= 1
+                if capture[2] == 0:
+                    self.active.remove(capture)
+                    self.found[capture[0]] = ' '.join(''.join(capture[3]).split())
+        if len(self.found) == len(self.targets):
+            raise _Done
+
+    def handle_data(self, data):
+        for capture in self.active:
+            capture[3].append(data)
+
+
+def select_text(html, targets, stop_at=(), start_at=None):
+    """
+    Return {name: text} for the first element with each class in targets ({name: class}).
+
+    Parsing starts at the tag containing the first occurrence of start_at,
+    if given and present, and stops once every target has been found or an
+    element with a stop_at class is reached; targets that were not found
+    are missing.
+    """
+    if start_at is not None:
+        at = html.find(start_at)
+        if at != -1:
+            html = html[max(html.rfind('<', 0, at), 0):]
+    parser = _TargetParser(targets, stop_at)
+    try:
+        parser.feed(html)
+    except _Done:
+        pass
+    return parser.found
+
+
+class _TextParser(HTMLParser):
+    """Collect visible text, skipping scripts and styles, until limit characters"""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.size = 0
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style', 'noscript', 'template'):
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style', 'noscript', 'template') and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= self.limit:
+            raise _Done
+
+
+def visible_text(html, limit=GENERIC_TEXT_LIMIT):
+    parser = _TextParser(limit)
+    try:
+        parser.feed(html)
+    except _Done:
+        pass
+    return ' '.join(''.join(parser.parts).split())[:limit]
+
+
+def _decode_at(html, start):
+    """Decode the JSON value starting at (or just after whitespace from) html[start]"""
+    while start < len(html) and html[start].isspace():
+        start += 1
+    try:
+        value, _ = json.JSONDecoder().raw_decode(html, start)
+    except ValueError:
+        return None
+    return value
+
+
+def iter_ld_json(html):
+    """Yield each JSON-LD object embedded in the page"""
+    at = html.find('application/ld+json')
+    while at != -1:
+        start = html.find('>', at)
+        if start == -1:
+            return
+        value = _decode_at(html, start + 1)
+        if isinstance(value, list):
+            yield from value
+        elif value is not None:
+            yield value
+        at = html.find('application/ld+json', start)
+
+
+@register_carrier('usps', 'usps.com')
+def extract_usps(html):
+    """USPS renders the latest step server-side; parse from the tracking bar to the collapsed history below it"""
+    found = select_text(html, {
+        'status': 'tb-status',
+        'detail': 'tb-status-detail',
+        'location': 'tb-location',
+        'time': 'tb-date',
+        'eta': 'expected-delivery-date',
+    }, stop_at=('collapsed',), start_at='track-bar-container')
+    if not found.get('status'):
+        return None
+    return tracking_result(
+        classify_tracking_text(found['status']),
+        last_event=tracking_event(found.get('detail') or found['status'], found.get('location'), found.get('time')),
+        eta=found.get('eta') or None,
+    )
+
+
+def extract_generic(html):
+    """
+    Fallback for unregistered hosts: a schema.org ParcelDelivery if the page
+    embeds one, otherwise keywords in the first GENERIC_TEXT_LIMIT characters
+    of visible text.
+
+    Page text can only say a parcel is moving, never that it was delivered:
+    navigation and FAQ copy ("Delivered to 200 countries") mention delivery
+    too, and delivered parcels are not polled again.
+    """
+    for item in iter_ld_json(html):
+        if isinstance(item, dict) and item.get('@type') == 'ParcelDelivery':
+            event = item.get('deliveryStatus') or {}
+            if isinstance(event, str):
+                event = {'name': event}
+            description = event.get('name') or event.get('description') or ''
+            return tracking_result(
+                classify_tracking_text(description),
+                last_event=tracking_event(description, None, event.get('startDate')),
+                eta=item.get('expectedArrivalUntil') or item.get('expectedArrivalFrom'),
+            )
+    text = visible_text(html)
+    return tracking_result('in_transit' if IN_TRANSIT_RE.search(text) else 'unknown')
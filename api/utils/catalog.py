@@ -0,0 +1,383 @@
+import base64
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; clients then get gzip
+    brotli = None
+
+from api.utils.cache import tiered_cache
+from api.utils.search import build_search_index
+from api.utils.shopify import iter_pages, iter_product_pages, iter_product_pages_parallel
+from api.utils.shopify_graphql import iter_bulk_product_pages, iter_graphql_product_pages
+
+logger = logging.getLogger(__name__)
+
+CATALOG_KEY = 'shopify_catalog'
+WATERMARK_KEY = 'shopify_catalog_watermark'
+LAST_FULL_SYNC_KEY = 'shopify_catalog_last_full_sync'
+
+PRODUCT_FIELDS = (
+    "id", "title", "description", "vendor", "product_type", "tags", "handle",
+    "published_at", "updated_at", "variants", "has_stock", "url",
+)
+
+# Shopify's updated_at has one-second resolution and the shop clock is not ours,
+# so every incremental sync re-reads a small window before the watermark.
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def serialize_variant(variant):
+    """Convert a Shopify REST variant dict into the dict we serve"""
+    inventory_qty = variant["inventory_quantity"]
+    return {
+        "id": variant["id"],
+        "title": variant["title"],
+        "sku": variant["sku"],
+        "price": variant["price"],
+        "compare_at_price": variant["compare_at_price"],
+        "in_stock": inventory_qty > 0,
+        "inventory_quantity": inventory_qty,
+        "requires_shipping": variant["requires_shipping"]
+    }
+
+
+def serialize_product(product):
+    """Convert a Shopify REST product dict into the dict we serve"""
+    variants = [serialize_variant(variant) for variant in product["variants"]]
+    return {
+        "id": product["id"],
+        "title": product["title"],
+        "description": product["body_html"],
+        "vendor": product["vendor"],
+        "product_type": product["product_type"],
+        "tags": product["tags"].split(',') if product["tags"] else [],
+        "handle": product["handle"],
+        "published_at": product["published_at"],
+        "updated_at": product["updated_at"],
+        "variants": variants,
+        "has_stock": any(v["in_stock"] for v in variants),
+        "url": f"https://utility.materials.nyc/products/{product['handle']}"
+    }
+
+
+def iter_catalog_pages(full=False, **params):
+    """
+    Yield pages of REST-shaped product dicts using SHOPIFY_CATALOG_FETCHER.
+
+    `full` marks a fetch of the whole catalog: REST then fetches ID ranges in
+    parallel and 'graphql_bulk' runs a bulk operation. Smaller (incremental)
+    fetches always page normally.
+    """
+    fetcher = settings.SHOPIFY_CATALOG_FETCHER
+    if fetcher == 'graphql_bulk' and full:
+        return iter_bulk_product_pages(**params)
+    if fetcher in ('graphql', 'graphql_bulk'):
+        return iter_graphql_product_pages(**params)
+    if fetcher != 'rest':
+        raise ValueError(f"Unknown SHOPIFY_CATALOG_FETCHER: {fetcher}")
+
+    workers = settings.SHOPIFY_CATALOG_FETCH_WORKERS
+    if full and workers > 1:
+        return iter_product_pages_parallel(max_workers=workers, **params)
+    return iter_product_pages(**params)
+
+
+def iter_products(full=False, **params):
+    """Yield every product matching params as pages stream in from Shopify"""
+    for page in iter_catalog_pages(full=full, **params):
+        for product in page:
+            yield product
+
+
+def encode_cursor(product_id):
+    """Encode a product id as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(str(product_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor(); raises ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (TypeError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _normalize(value):
+    return (value or '').strip().lower()
+
+
+class CatalogIndex:
+    """
+    Lookup tables over one catalog generation.
+
+    Each index maps a normalized value to the ascending catalog positions of
+    the products that have it, so a filtered query only walks the smallest
+    matching list instead of the whole catalog. Catalog positions follow
+    product id order, which is what cursors page over.
+
+    Variants are indexed by id and by SKU, each mapping to (product, variant).
+    """
+
+    FIELDS = ('product_type', 'vendor', 'tag', 'handle', 'in_stock')
+
+    def __init__(self, products):
+        self.ids = [product["id"] for product in products]
+        self._positions = {field: defaultdict(list) for field in self.FIELDS}
+        self._sets = {}
+        self.variants_by_id = {}
+        self.variants_by_sku = {}
+
+        for position, product in enumerate(products):
+            for variant in product["variants"]:
+                self.variants_by_id[variant["id"]] = (product, variant)
+                if variant["sku"]:
+                    # SKUs are not unique in Shopify; keep the first (lowest product id)
+                    self.variants_by_sku.setdefault(variant["sku"].strip(), (product, variant))
+            self._positions['product_type'][_normalize(product["product_type"])].append(position)
+            self._positions['vendor'][_normalize(product["vendor"])].append(position)
+            self._positions['handle'][_normalize(product["handle"])].append(position)
+            self._positions['in_stock'][product["has_stock"]].append(position)
+            for tag in {_normalize(tag) for tag in product["tags"]}:
+                self._positions['tag'][tag].append(position)
+
+    def variant(self, variant_id=None, sku=None):
+        """Return (product, variant) for a variant id or SKU, or None"""
+        if variant_id is not None:
+            return self.variants_by_id.get(variant_id)
+        return self.variants_by_sku.get((sku or '').strip())
+
+    def positions(self, field, value):
+        if field != 'in_stock':
+            value = _normalize(value)
+        return self._positions[field].get(value, [])
+
+    def _position_set(self, field, value):
+        key = (field, value)
+        positions = self._sets.get(key)
+        if positions is None:
+            positions = self._sets[key] = frozenset(self.positions(field, value))
+        return positions
+
+    def query(self, filters, after_id=None, limit=None):
+        """
+        Return (positions, total, next_after_id) for products matching every filter.
+
+        `filters` maps index field names to wanted values. Results start after
+        the product with id `after_id` and are capped at `limit`.
+        """
+        if filters:
+            candidates = sorted(
+                ((field, value, self.positions(field, value)) for field, value in filters.items()),
+                key=lambda candidate: len(candidate[2]),
+            )
+            _, _, smallest = candidates[0]
+            others = [self._position_set(field, value) for field, value, _ in candidates[1:]]
+            matches = [p for p in smallest if all(p in other for other in others)]
+        else:
+            matches = range(len(self.ids))
+
+        start = 0
+        if after_id is not None:
+            start = bisect.bisect_left(matches, bisect.bisect_right(self.ids, after_id))
+
+        end = len(matches) if limit is None else min(start + limit, len(matches))
+        page = matches[start:end]
+        next_after_id = self.ids[page[-1]] if end < len(matches) and len(page) else None
+        return list(page), len(matches), next_after_id
+
+
+class CatalogSnapshot:
+    """
+    One generation of the served catalog, with its response bodies pre-rendered.
+
+    The product list is serialized to JSON once, and the body for the common
+    case (source "cache") is compressed with gzip and brotli up front, so
+    serving a cache hit is just picking bytes. Bodies for other sources are
+    rendered on first use and kept on the snapshot. The ETag is a hash of the
+    product JSON, so it only changes when the catalog does. Filter indexes
+    and the search index are built with the snapshot, and rebuilt lazily
+    after it is read back from L2.
+    """
+
+    ENCODINGS = ('br', 'gzip', 'identity')
+
+    def __init__(self, products):
+        self.products = products
+        self.products_json = json.dumps(products, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = 'W/"%s"' % hashlib.sha256(self.products_json).hexdigest()[:32]
+        self._bodies = {}
+        for encoding in self.encodings():
+            self.body('cache', encoding)
+        self._index = CatalogIndex(products)
+        self._search_index = build_search_index(products)
+
+    def __getstate__(self):
+        # Indexes are cheap to rebuild and would only bloat the copy stored in L2
+        state = dict(self.__dict__)
+        state.pop('_index', None)
+        state.pop('_search_index', None)
+        return state
+
+    @property
+    def index(self):
+        index = self.__dict__.get('_index')
+        if index is None:
+            index = self._index = CatalogIndex(self.products)
+        return index
+
+    @property
+    def search_index(self):
+        index = self.__dict__.get('_search_index')
+        if index is None:
+            index = self._search_index = build_search_index(self.products)
+        return index
+
+    @classmethod
+    def encodings(cls):
+        return [e for e in cls.ENCODINGS if e != 'br' or brotli is not None]
+
+    def body(self, source, encoding='identity'):
+        """Return the response body for source, encoded with encoding"""
+        key = (source, encoding)
+        body = self._bodies.get(key)
+        if body is None:
+            body = b'{"products":' + self.products_json + b',"source":"' + source.encode() + b'"}'
+            if encoding == 'gzip':
+                body = gzip.compress(body, compresslevel=6)
+            elif encoding == 'br':
+                body = brotli.compress(body, quality=5)
+            self._bodies[key] = body
+        return body
+
+    def negotiate_encoding(self, accept_encoding):
+        """Pick the best encoding we have for an Accept-Encoding header"""
+        accepted = set()
+        for part in (accept_encoding or '').split(','):
+            name, _, params = part.strip().partition(';')
+            params = params.strip()
+            try:
+                quality = float(params[2:]) if params.startswith('q=') else 1.0
+            except ValueError:
+                quality = 0.0
+            if quality > 0:
+                accepted.add(name.strip().lower())
+        for encoding in self.encodings():
+            if encoding == 'identity' or encoding in accepted:
+                return encoding
+        return 'identity'
+
+    def matches(self, if_none_match):
+        """Return True if an If-None-Match header matches this snapshot's ETag"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        wanted = self.etag[2:]
+        return any(tag.strip().removeprefix('W/') == wanted for tag in if_none_match.split(','))
+
+    def __len__(self):
+        return len(self.products)
+
+
+class CatalogSync:
+    """
+    Keeps a stored copy of the active Shopify catalog up to date.
+
+    The catalog is kept in the shared cache as a dict of product id -> product dict,
+    together with the time of the last successful sync (the watermark). A sync
+    only asks Shopify for products updated since the watermark and merges them
+    in; products that were deleted or left the 'active' status are dropped.
+    A full refetch only happens when there is no stored catalog yet or the last
+    full sync is older than SHOPIFY_CATALOG_FULL_SYNC_INTERVAL.
+    """
+
+    def __init__(self, store=tiered_cache):
+        self.store = store
+
+    def sync(self, force_full=False):
+        """Bring the stored catalog up to date and return it as a product list"""
+        catalog = self.store.get(CATALOG_KEY)
+        watermark = self.store.get(WATERMARK_KEY)
+        last_full_sync = self.store.get(LAST_FULL_SYNC_KEY)
+
+        if force_full or catalog is None or watermark is None or self._full_sync_due(last_full_sync):
+            catalog = self.full_sync()
+        else:
+            catalog = self.incremental_sync(catalog, watermark)
+
+        return self.as_list(catalog)
+
+    def full_sync(self):
+        """Refetch every active product and replace the stored catalog"""
+        started_at = timezone.now()
+        logger.info("🔄 Running full catalog sync")
+
+        catalog = {}
+        for product in iter_products(full=True, status='active'):
+            catalog[product["id"]] = serialize_product(product)
+
+        self._save(catalog, started_at, full=True)
+        logger.info("✅ Full catalog sync stored %d products", len(catalog))
+        return catalog
+
+    def incremental_sync(self, catalog, watermark):
+        """Merge products changed since the watermark into the stored catalog"""
+        started_at = timezone.now()
+        updated_at_min = (datetime.fromisoformat(watermark) - WATERMARK_OVERLAP).isoformat()
+        logger.info("🔄 Running incremental catalog sync (updated_at_min=%s)", updated_at_min)
+
+        catalog = dict(catalog)
+        updated = removed = 0
+
+        # No status filter here: products that moved to draft/archived also
+        # bump updated_at, and we need to see them to drop them.
+        for product in iter_products(updated_at_min=updated_at_min):
+            if product["status"] == 'active':
+                catalog[product["id"]] = serialize_product(product)
+                updated += 1
+            elif catalog.pop(product["id"], None) is not None:
+                removed += 1
+
+        for page in iter_pages('events', filter='Product', verb='destroy',
+                               created_at_min=updated_at_min, fields='subject_id'):
+            for event in page:
+                if catalog.pop(event["subject_id"], None) is not None:
+                    removed += 1
+
+        self._save(catalog, started_at)
+        logger.info("✅ Incremental catalog sync: %d updated, %d removed, %d total",
+                    updated, removed, len(catalog))
+        return catalog
+
+    @staticmethod
+    def as_list(catalog):
+        """Return catalog products in Shopify's default (id) order"""
+        return [catalog[product_id] for product_id in sorted(catalog)]
+
+    def _full_sync_due(self, last_full_sync):
+        if last_full_sync is None:
+            return True
+        age = timezone.now() - datetime.fromisoformat(last_full_sync)
+        return age.total_seconds() >= settings.SHOPIFY_CATALOG_FULL_SYNC_INTERVAL
+
+    def _save(self, catalog, started_at, full=False):
+        # The stored catalog never expires on its own; freshness is tracked by
+        # the watermark, not by the cache timeout.
+        values = {
+            CATALOG_KEY: catalog,
+            WATERMARK_KEY: started_at.isoformat(),
+        }
+        if full:
+            values[LAST_FULL_SYNC_KEY] = started_at.isoformat()
+        self.store.set_many(values, timeout=None)
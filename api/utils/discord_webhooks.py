@@ -0,0 +1,235 @@
+"""
+Posting messages to the Discord webhook within its limits.
+
+Discord rate limits each webhook (about 5 requests per 2 seconds, plus a
+per-channel limit) and reports the state of its bucket on every response
+(X-RateLimit-Remaining, X-RateLimit-Reset-After). post_message() waits
+for the bucket to reset once it is used up, and when a 429 comes back
+anyway (other processes share the webhook) waits out its retry_after and
+tries again, up to DISCORD_RATE_LIMIT_RETRIES times.
+
+pack_messages() and digest_message() keep the number of messages down: a
+message carries up to MAX_EMBEDS embeds (and MAX_EMBED_CHARS characters of
+embed text), so a burst of notifications goes out as a few messages, and a
+digest too big for one message is summarized.
+"""
+from collections import Counter
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from api.utils import metrics
+from api.utils.http import outbound_session
+
+logger = logging.getLogger(__name__)
+
+# Discord's limits for one message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+MAX_FIELDS = 25
+
+# Entries listed in a summarized digest, and the characters shown of each
+DIGEST_ENTRIES = 10
+DIGEST_ENTRY_CHARS = 200
+DIGEST_COLOR = 0x95a5a6
+
+
+class DiscordRateLimited(Exception):
+    pass
+
+
+class DiscordRateLimit:
+    """
+    This process's view of the webhook's rate-limit bucket, from the headers of each response.
+
+    Requests are counted against the last reported remaining count, so
+    concurrent senders don't all go at once. Once the bucket has reset it is
+    assumed full (X-RateLimit-Limit) until a response reports on it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.limit = None
+        self.remaining = None  # None: nothing known, don't hold requests back
+        self.reset_at = 0.0
+        self.refilled = False  # remaining is our estimate for a window no response has reported on yet
+
+    def acquire(self):
+        """Take one request from the bucket, sleeping until it resets if it is used up"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.remaining is not None and now >= self.reset_at and not self.refilled:
+                    self.remaining = self.limit
+                    self.refilled = True
+                if self.remaining is None or self.remaining > 0:
+                    if self.remaining:
+                        self.remaining -= 1
+                    break
+                # Used up: wait for the reset, or for a response to say when the new window resets
+                delay = 0.05 if self.refilled else self.reset_at - now
+            time.sleep(delay)
+            waited += delay
+        if waited:
+            metrics.observe('discord.rate_limit_wait', waited)
+
+    def update(self, headers):
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset_after = float(headers['X-RateLimit-Reset-After'])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self.lock:
+            now = time.monotonic()
+            if self.remaining is not None and (self.refilled or now < self.reset_at):
+                # Concurrent requests' responses arrive out of order, and requests
+                # still in flight were already counted; the lowest count is the latest
+                remaining = min(remaining, self.remaining)
+            try:
+                self.limit = int(headers['X-RateLimit-Limit'])
+            except (KeyError, TypeError, ValueError):
+                pass
+            self.remaining = remaining
+            self.reset_at = now + reset_after
+            self.refilled = False
+
+    def limited(self, retry_after):
+        """Record a 429: nothing may be sent for retry_after seconds"""
+        with self.lock:
+            self.remaining = 0
+            self.reset_at = max(self.reset_at, time.monotonic() + retry_after)
+            self.refilled = False
+
+
+rate_limit = DiscordRateLimit()
+
+
+def _retry_after(response):
+    """Seconds to wait after a 429, from its JSON body or else the Retry-After header"""
+    try:
+        return float(response.json()['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def post_message(payload):
+    """
+    Post one message ({content, embeds}) to DISCORD_WEBHOOK_URL, waiting out rate limits.
+
+    Raises DiscordRateLimited if it is still rate limited after
+    DISCORD_RATE_LIMIT_RETRIES waits, and requests' HTTPError for other failures.
+    """
+    session = outbound_session()
+    for attempt in range(settings.DISCORD_RATE_LIMIT_RETRIES + 1):
+        rate_limit.acquire()
+        response = session.post(settings.DISCORD_WEBHOOK_URL, params={'wait': 'true'}, json=payload,
+                                timeout=settings.DISCORD_SEND_TIMEOUT)
+        rate_limit.update(response.headers)
+        if response.status_code != 429:
+            response.raise_for_status()
+            metrics.incr('discord.messages')
+            metrics.incr('discord.embeds', len(payload.get('embeds') or []))
+            return response
+
+        retry_after = _retry_after(response)
+        rate_limit.limited(retry_after)
+        metrics.incr('discord.rate_limited')
+        logger.warning("Discord rate limited the webhook (scope %s); retrying in %.2fs",
+                       response.headers.get('X-RateLimit-Scope', 'unknown'), retry_after)
+    raise DiscordRateLimited(f"Still rate limited after {settings.DISCORD_RATE_LIMIT_RETRIES} retries")
+
+
+def embed_chars(embed):
+    """Characters of an embed that count towards Discord's per-message limit"""
+    return (
+        len(embed.get('title') or '')
+        + len(embed.get('description') or '')
+        + sum(len(f.get('name') or '') + len(f.get('value') or '') for f in embed.get('fields') or [])
+        + len((embed.get('footer') or {}).get('text') or '')
+        + len((embed.get('author') or {}).get('name') or '')
+    )
+
+
+def pack_messages(payloads):
+    """
+    Combine message payloads into as few messages as Discord allows.
+
+    Returns [(message, [indexes of the payloads it carries])], keeping their
+    order. Embeds-only payloads share messages up to MAX_EMBEDS embeds and
+    MAX_EMBED_CHARS characters; payloads with text content go on their own.
+    """
+    messages = []
+    embeds, chars, indexes = [], 0, []
+
+    def flush():
+        if indexes:
+            messages.append(({'embeds': list(embeds)}, list(indexes)))
+            embeds.clear()
+            indexes.clear()
+
+    for i, payload in enumerate(payloads):
+        payload_embeds = payload.get('embeds') or []
+        if payload.get('content') or not payload_embeds:
+            flush()
+            chars = 0
+            messages.append((payload, [i]))
+            continue
+        payload_chars = sum(embed_chars(e) for e in payload_embeds)
+        if embeds and (len(embeds) + len(payload_embeds) > MAX_EMBEDS or chars + payload_chars > MAX_EMBED_CHARS):
+            flush()
+            chars = 0
+        embeds.extend(payload_embeds)
+        chars += payload_chars
+        indexes.append(i)
+    flush()
+    return messages
+
+
+def _summary_line(embed):
+    """The text a digest shows for one embed: its first full-width field, else its description"""
+    field = next((f for f in embed.get('fields') or [] if not f.get('inline', True)), None)
+    text = ' '.join(((field or {}).get('value') or embed.get('description') or '').split())
+    if len(text) > DIGEST_ENTRY_CHARS:
+        text = text[:DIGEST_ENTRY_CHARS - 1] + '…'
+    return text or '-'
+
+
+def _duration(seconds):
+    return f"{round(seconds / 60)} minutes" if seconds >= 120 else f"{round(seconds)} seconds"
+
+
+def digest_message(payloads, window):
+    """
+    One message for the digest of payloads collected over window seconds.
+
+    A digest that fits in one message is sent as is; a bigger one becomes a
+    single summary embed with counts per kind of notification (embed title)
+    and the newest DIGEST_ENTRIES entries.
+    """
+    packed = pack_messages(payloads)
+    if len(packed) == 1:
+        return packed[0][0]
+
+    embeds = [embed for payload in payloads for embed in payload.get('embeds') or []]
+    counts = Counter(embed.get('title') or 'Notification' for embed in embeds)
+    newest = embeds[-DIGEST_ENTRIES:][::-1]
+    summary = {
+        'title': f"📋 {len(payloads)} notifications in the last {_duration(window)}",
+        'description': '\n'.join(f"{title}: **{count}**" for title, count in counts.most_common()),
+        'color': DIGEST_COLOR,
+        'fields': [
+            {'name': embed.get('title') or 'Notification', 'value': _summary_line(embed), 'inline': False}
+            for embed in newest[:MAX_FIELDS]
+        ],
+        'footer': {'text': f"Showing the newest {len(newest)} of {len(embeds)}"},
+    }
+    if embeds[-1].get('timestamp'):
+        summary['timestamp'] = embeds[-1]['timestamp']
+    return {'embeds': [summary]}
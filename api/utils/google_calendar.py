@@ -1,9 +1,19 @@
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 from django.conf import settings
+import concurrent.futures
+import httplib2
 import json
+import threading
+import time
+
+from api.utils import metrics
+
+_executor = None
+_executor_lock = threading.Lock()
 
 class GoogleCalendarService:
     @staticmethod
@@ -24,8 +34,8 @@ class GoogleCalendarService:
         return flow
 
     @staticmethod
-    def build_service(creds_dict):
-        """Build Google Calendar service from credentials"""
+    def build_service(creds_dict, timeout=None):
+        """Build Google Calendar service from credentials, optionally with a socket timeout (seconds)"""
         # Ensure we're working with a dictionary
         if not isinstance(creds_dict, dict):
             try:
@@ -58,6 +68,9 @@ class GoogleCalendarService:
             raise ValueError(f"Failed to create credentials object: {str(e)}")
 
         # Build and return service
+        if timeout:
+            http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout))
+            return build('calendar', 'v3', http=http)
         return build('calendar', 'v3', credentials=credentials)
 
     @staticmethod
@@ -125,4 +138,59 @@ class GoogleCalendarService:
             calendarId=calendar_id,
             body=event,
             sendUpdates='all'
-        ).execute() 
\ No newline at end of file
+        ).execute()
+
+
+def calendar_executor():
+    """
+    The process-wide pool calendars are queried on.
+
+    Its size (CALENDAR_FETCH_WORKERS) caps concurrent Google Calendar
+    requests in this process. Created on first use so gunicorn workers don't
+    inherit threads from the master across fork.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=settings.CALENDAR_FETCH_WORKERS,
+                thread_name_prefix='calendar',
+            )
+            metrics.register_gauge('calendar.queued', lambda: _executor._work_queue.qsize())
+        return _executor
+
+
+def fetch_calendars(calendars, fetch):
+    """
+    Run fetch(calendar) for every calendar concurrently on calendar_executor().
+
+    Returns [(calendar, result, error)] in the order given; error is None, or
+    a message for a calendar whose fetch raised or hadn't finished within
+    CALENDAR_FANOUT_DEADLINE seconds. Slow calendars aren't waited for past
+    the deadline, so fetch should bound its own requests (build_service's
+    timeout) for the pool threads to free up. fetch runs off the request
+    thread and must not touch the database.
+    """
+    def timed(calendar):
+        started = time.monotonic()
+        try:
+            return fetch(calendar)
+        finally:
+            metrics.observe('calendar.fetch_seconds', time.monotonic() - started)
+
+    executor = calendar_executor()
+    futures = [executor.submit(timed, calendar) for calendar in calendars]
+    concurrent.futures.wait(futures, timeout=settings.CALENDAR_FANOUT_DEADLINE)
+
+    results = []
+    for calendar, future in zip(calendars, futures):
+        if not future.done():
+            future.cancel()
+            metrics.incr('calendar.timeouts')
+            results.append((calendar, None, f"Timed out after {settings.CALENDAR_FANOUT_DEADLINE:g}s"))
+        elif future.exception() is not None:
+            metrics.incr('calendar.errors')
+            results.append((calendar, None, str(future.exception())))
+        else:
+            results.append((calendar, future.result(), None))
+    return results
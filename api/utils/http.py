@@ -0,0 +1,142 @@
+"""
+Shared outbound HTTP client for third-party sites (carrier tracking pages).
+
+One requests.Session per process keeps connections to each host alive, so
+repeated fetches from the same carrier skip the TCP and TLS handshakes.
+Idempotent requests are retried with backoff (honouring a short
+Retry-After, giving up on a long one), and response bodies are capped so
+one huge page can't tie up a worker.
+"""
+import threading
+
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+from api.utils import metrics
+
+# Number of per-host pools kept; carrier traffic goes to a handful of hosts
+POOL_HOSTS = 20
+CHUNK_SIZE = 64 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ResponseTooLarge(requests.RequestException):
+    pass
+
+
+class _Retry(Retry):
+    """
+    Retry that hands the response back instead of sleeping when Retry-After
+    asks for more than OUTBOUND_HTTP_MAX_RETRY_AFTER seconds, so a carrier
+    can't park a pool thread for an hour.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None:
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None and retry_after > settings.OUTBOUND_HTTP_MAX_RETRY_AFTER:
+                metrics.incr('http.outbound.retry_after_exceeded')
+                # With raise_on_status off, urllib3 returns the response rather than raising this
+                raise MaxRetryError(_pool, url, ResponseError(f"Retry-After of {retry_after:g}s is too long"))
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+def _adapter():
+    retry = _Retry(
+        total=settings.OUTBOUND_HTTP_RETRIES,
+        connect=settings.OUTBOUND_HTTP_RETRIES,
+        read=settings.OUTBOUND_HTTP_RETRIES,
+        status=settings.OUTBOUND_HTTP_RETRIES,
+        backoff_factor=0.3,
+        backoff_max=settings.OUTBOUND_HTTP_MAX_RETRY_AFTER,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the last response to the caller's raise_for_status()
+    )
+    # One pool per host, with as many keep-alive connections as threads that
+    # can use it at once (the tracking executor's size)
+    return HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=settings.TRACKING_FETCH_WORKERS,
+        max_retries=retry,
+    )
+
+
+def outbound_session():
+    """
+    The process-wide Session for outbound requests.
+
+    Created on first use so gunicorn workers don't share sockets inherited
+    from the master across fork.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = _adapter()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def outbound_get(url, max_bytes=None, **kwargs):
+    """
+    GET url on the shared session, reading at most max_bytes of body.
+
+    Raises ResponseTooLarge when the body (declared or actual) is larger than
+    max_bytes (OUTBOUND_HTTP_MAX_BODY_BYTES by default). The returned response
+    has its content loaded, like a non-streamed requests response.
+    """
+    if max_bytes is None:
+        max_bytes = settings.OUTBOUND_HTTP_MAX_BODY_BYTES
+    metrics.incr('http.outbound.requests')
+
+    with outbound_session().get(url, stream=True, **kwargs) as response:
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            metrics.incr('http.outbound.too_large')
+            raise ResponseTooLarge(f"{url} declared {declared} bytes (limit {max_bytes})", response=response)
+
+        body = bytearray()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            body.extend(chunk)
+            if len(body) > max_bytes:
+                metrics.incr('http.outbound.too_large')
+                raise ResponseTooLarge(f"{url} is larger than {max_bytes} bytes", response=response)
+        response._content = bytes(body)
+    return response
+
+
+def connection_stats():
+    """Connections opened and requests sent over them, summed across this process's host pools"""
+    stats = {'connections': 0, 'requests': 0}
+    session = _session
+    if session is None:
+        return stats
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                stats['connections'] += pool.num_connections
+                stats['requests'] += pool.num_requests
+    return stats
+
+
+def _reuse_ratio():
+    stats = connection_stats()
+    if not stats['requests']:
+        return 0.0
+    return 1 - stats['connections'] / stats['requests']
+
+
+metrics.register_gauge('http.outbound.connections_opened', lambda: connection_stats()['connections'])
+metrics.register_gauge('http.outbound.pool_requests', lambda: connection_stats()['requests'])
+metrics.register_gauge('http.outbound.connection_reuse_ratio', _reuse_ratio)
@@ -0,0 +1,150 @@
+"""
+Inventory change notifications for the served catalog.
+
+Every catalog refresh is compared with the stock levels seen at the last
+one, kept in the shared cache as a compact snapshot of variant id -> level
+('in', 'low' or 'out') plus the number of variants at each level. Discord
+only hears about variants whose level changed, and the level counts it is
+shown are the previous ones adjusted by those changes, so a refresh where
+nothing moved costs one pass over the variants and no message, however
+many workers refresh.
+
+Variants are 'low' at STORE_LOW_STOCK_THRESHOLD units or fewer. Variants
+that appear or disappear with their products are counted but not
+announced. If there is no snapshot yet (first run, or it was evicted) the
+refresh just records one.
+"""
+import logging
+
+from django.conf import settings
+
+from api.utils.cache import tiered_cache
+from api.utils.utils import send_discord_webhook
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'store_inventory_snapshot'
+LOCK_KEY = 'store_inventory_snapshot_lock'
+LOCK_TIMEOUT = 60
+
+LEVELS = ('in', 'low', 'out')
+
+# Variants named per kind of change before the list is cut short
+LISTED_CHANGES = 10
+
+
+def stock_level(quantity):
+    if quantity <= 0:
+        return 'out'
+    if quantity <= settings.STORE_LOW_STOCK_THRESHOLD:
+        return 'low'
+    return 'in'
+
+
+def diff_inventory(snapshot, product_list):
+    """
+    Compare product_list with a snapshot from an earlier refresh.
+
+    Returns (new snapshot, changes), where changes lists
+    {product, variant, quantity, before, after} for every variant whose level
+    changed. The new snapshot's counts are the old ones adjusted by the
+    diff; with no earlier snapshot they are counted from scratch and there
+    are no changes.
+    """
+    previous = snapshot['levels'] if snapshot else {}
+    counts = dict(snapshot['counts']) if snapshot else dict.fromkeys(LEVELS, 0)
+    levels = {}
+    changes = []
+
+    for product in product_list:
+        for variant in product["variants"]:
+            quantity = variant["inventory_quantity"]
+            level = levels[variant["id"]] = stock_level(quantity)
+            before = previous.get(variant["id"])
+            if before == level:
+                continue
+            counts[level] += 1
+            if before is None:
+                continue  # New variant (or first snapshot): counted, not announced
+            counts[before] -= 1
+            changes.append({
+                "product": product["title"],
+                "variant": variant["title"],
+                "quantity": quantity,
+                "before": before,
+                "after": level,
+            })
+
+    for variant_id in previous.keys() - levels.keys():
+        counts[previous[variant_id]] -= 1
+
+    return {'levels': levels, 'counts': counts}, changes
+
+
+def _change_field(name, changes, show_quantity=False):
+    lines = []
+    for change in changes[:LISTED_CHANGES]:
+        label = change["product"] if change["variant"] == 'Default Title' else f"{change['product']} – {change['variant']}"
+        lines.append(f"• {label} ({change['quantity']} left)" if show_quantity else f"• {label}")
+    if len(changes) > LISTED_CHANGES:
+        lines.append(f"_…and {len(changes) - LISTED_CHANGES} more_")
+    return {"name": f"{name} ({len(changes)})", "value": "\n".join(lines)[:1024], "inline": False}
+
+
+def notify_inventory_changes(changes, counts, product_count):
+    """Queue a Discord message naming the variants whose stock level changed"""
+    sold_out = [c for c in changes if c["after"] == 'out']
+    running_low = [c for c in changes if c["after"] == 'low' and c["before"] == 'in']
+    restocked = [c for c in changes if c["after"] == 'in' or (c["after"] == 'low' and c["before"] == 'out')]
+
+    fields = []
+    if sold_out:
+        fields.append(_change_field("❌ Sold Out", sold_out))
+    if running_low:
+        fields.append(_change_field("⚠️ Running Low", running_low, show_quantity=True))
+    if restocked:
+        fields.append(_change_field("✅ Restocked", restocked, show_quantity=True))
+    fields += [
+        {"name": "📦 Total Products", "value": str(product_count), "inline": True},
+        {"name": "🔢 Variants In Stock", "value": str(counts['in']), "inline": True},
+        {"name": "⚠️ Low Stock", "value": f"{counts['low']} variants", "inline": True},
+        {"name": "❌ Out of Stock", "value": f"{counts['out']} variants", "inline": True},
+    ]
+
+    send_discord_webhook(
+        title="⚙️ utility.materials.nyc Inventory Update",
+        description=f"Stock level changed for {len(changes)} variant{'s' if len(changes) != 1 else ''}",
+        fields=fields,
+        color="ff5f05",  # Orange color
+        timestamp=True
+    )
+
+
+def report_inventory_changes(product_list):
+    """
+    Diff product_list against the stored snapshot, store the new one, and
+    notify Discord of any stock level changes; returns the changes.
+
+    Workers refreshing at the same moment would diff the same snapshot and
+    announce the same changes, so only the one holding the lock does.
+    """
+    store = tiered_cache.l2
+    if not store.add(LOCK_KEY, True, timeout=LOCK_TIMEOUT):
+        logger.info("📦 Another worker is diffing inventory; skipping")
+        return []
+    try:
+        snapshot, changes = diff_inventory(store.get(SNAPSHOT_KEY), product_list)
+        store.set(SNAPSHOT_KEY, snapshot, timeout=None)
+    finally:
+        store.delete(LOCK_KEY)
+
+    counts = snapshot['counts']
+    logger.info(
+        "📊 INVENTORY: %d products, %d variants (%d in stock, %d low, %d out); %d level changes",
+        len(product_list), len(snapshot['levels']), counts['in'], counts['low'], counts['out'], len(changes)
+    )
+    if changes:
+        logger.info("📨 Queueing inventory changes for Discord:\n%s", "\n".join(
+            f"- {c['product']} / {c['variant']}: {c['before']} → {c['after']} ({c['quantity']})" for c in changes))
+        notify_inventory_changes(changes, counts, len(product_list))
+    return changes
@@ -0,0 +1,61 @@
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_gauge_callbacks = {}
+_summaries = {}
+
+
+def incr(name, value=1):
+    """Increment a per-process counter"""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name, value):
+    """Record the current value of a per-process gauge"""
+    with _lock:
+        _gauges[name] = value
+
+
+def register_gauge(name, callback):
+    """Register a gauge whose value is read from callback() at snapshot time"""
+    with _lock:
+        _gauge_callbacks[name] = callback
+
+
+def observe(name, value):
+    """Record one observation (e.g. a latency in seconds) for a summary"""
+    with _lock:
+        summary = _summaries.get(name)
+        if summary is None:
+            summary = _summaries[name] = {'count': 0, 'sum': 0.0, 'max': 0.0}
+        summary['count'] += 1
+        summary['sum'] += value
+        summary['max'] = max(summary['max'], value)
+
+
+def snapshot():
+    """Return all metrics of this process as a JSON-serializable dict"""
+    with _lock:
+        gauges = dict(_gauges)
+        callbacks = dict(_gauge_callbacks)
+        counters = dict(_counters)
+        summaries = {
+            name: dict(summary, avg=summary['sum'] / summary['count'] if summary['count'] else 0.0)
+            for name, summary in _summaries.items()
+        }
+
+    for name, callback in callbacks.items():
+        try:
+            gauges[name] = callback()
+        except Exception as e:
+            gauges[name] = f"error: {e}"
+
+    return {
+        'counters': counters,
+        'gauges': gauges,
+        'summaries': summaries,
+    }
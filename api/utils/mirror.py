@@ -0,0 +1,180 @@
+from datetime import timedelta
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import shopify
+
+from api.models import DeletedProduct, Product, Variant
+from api.utils.catalog import serialize_product
+
+logger = logging.getLogger(__name__)
+
+# How long deleted products are remembered; well past Shopify's webhook retries
+TOMBSTONE_RETENTION = timedelta(days=7)
+
+PRODUCT_UPDATE_FIELDS = [
+    'title', 'body_html', 'vendor', 'product_type', 'tags', 'handle', 'status',
+    'published_at', 'shopify_updated_at', 'synced_at',
+]
+VARIANT_UPDATE_FIELDS = [
+    'product', 'title', 'sku', 'price', 'compare_at_price', 'position',
+    'inventory_item_id', 'inventory_quantity', 'requires_shipping',
+]
+
+
+def _parse_datetime(value):
+    return parse_datetime(value) if value else None
+
+
+def product_from_shopify(product):
+    """Build an unsaved Product from a Shopify REST product dict"""
+    return Product(
+        id=product["id"],
+        title=product["title"],
+        body_html=product.get("body_html") or '',
+        vendor=product.get("vendor") or '',
+        product_type=product.get("product_type") or '',
+        tags=product.get("tags") or '',
+        handle=product["handle"],
+        status=product.get("status") or 'active',
+        published_at=_parse_datetime(product.get("published_at")),
+        shopify_updated_at=_parse_datetime(product.get("updated_at")),
+    )
+
+
+def variant_from_shopify(variant, product_id):
+    """Build an unsaved Variant from a Shopify REST variant dict"""
+    return Variant(
+        id=variant["id"],
+        product_id=product_id,
+        title=variant["title"],
+        sku=variant.get("sku") or '',
+        price=variant["price"],
+        compare_at_price=variant.get("compare_at_price") or None,
+        position=variant.get("position") or 1,
+        inventory_item_id=variant.get("inventory_item_id"),
+        inventory_quantity=variant.get("inventory_quantity") or 0,
+        requires_shipping=variant.get("requires_shipping", True),
+    )
+
+
+def _is_stale(product, updated_at, deleted_at):
+    """Whether a payload is older than the mirrored product, or than its deletion"""
+    payload_updated_at = _parse_datetime(product.get("updated_at"))
+    if payload_updated_at is None:
+        return False
+    return ((updated_at is not None and payload_updated_at < updated_at)
+            or (deleted_at is not None and payload_updated_at <= deleted_at))
+
+
+def upsert_products(products):
+    """
+    Insert or update Shopify REST product dicts (with their variants) in bulk.
+
+    Shopify doesn't deliver webhooks in order, so payloads older (by
+    updated_at) than the mirrored product, or than its deletion, are
+    skipped. Variants that no longer exist on an upserted product are
+    deleted. Returns the number of products written.
+    """
+    if not products:
+        return 0
+
+    with transaction.atomic():
+        ids = [product["id"] for product in products]
+        # Locked so a concurrent webhook for the same product waits for this one
+        updated = dict(Product.objects.select_for_update().filter(id__in=ids)
+                       .values_list('id', 'shopify_updated_at'))
+        deleted = dict(DeletedProduct.objects.filter(id__in=ids).values_list('id', 'deleted_at'))
+        fresh = [
+            product for product in products
+            if not _is_stale(product, updated.get(product["id"]), deleted.get(product["id"]))
+        ]
+        if len(fresh) < len(products):
+            logger.info(f"Skipped {len(products) - len(fresh)} out-of-date product payloads")
+        if not fresh:
+            return 0
+
+        product_rows = [product_from_shopify(product) for product in fresh]
+        variant_rows = [
+            variant_from_shopify(variant, product["id"])
+            for product in fresh
+            for variant in product.get("variants") or []
+        ]
+        Product.objects.bulk_create(
+            product_rows, update_conflicts=True,
+            unique_fields=['id'], update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+        Variant.objects.filter(product_id__in=[row.id for row in product_rows]) \
+            .exclude(id__in=[row.id for row in variant_rows]).delete()
+        Variant.objects.bulk_create(
+            variant_rows, update_conflicts=True,
+            unique_fields=['id'], update_fields=VARIANT_UPDATE_FIELDS,
+        )
+    return len(product_rows)
+
+
+def delete_products(product_ids):
+    """Remove products (and their variants) from the mirror, leaving tombstones for late updates"""
+    now = timezone.now()
+    with transaction.atomic():
+        DeletedProduct.objects.bulk_create(
+            [DeletedProduct(id=product_id, deleted_at=now) for product_id in product_ids],
+            update_conflicts=True, unique_fields=['id'], update_fields=['deleted_at'],
+        )
+        deleted, _ = Product.objects.filter(id__in=product_ids).delete()
+    DeletedProduct.objects.filter(deleted_at__lt=now - TOMBSTONE_RETENTION).delete()
+    return deleted
+
+
+def refresh_inventory_quantity(inventory_item_id):
+    """
+    Re-read an inventory item's total available quantity from Shopify.
+
+    inventory_levels/update only carries the level at one location, while a
+    variant's inventory_quantity is the sum over all locations, so the total
+    is fetched instead of trusting the webhook's number. Returns True if a
+    mirrored variant was updated.
+    """
+    levels = shopify.InventoryLevel.find(inventory_item_ids=inventory_item_id)
+    available = sum(level.available or 0 for level in levels)
+    return Variant.objects.filter(inventory_item_id=inventory_item_id) \
+        .update(inventory_quantity=available) > 0
+
+
+def serialize_mirrored_product(product):
+    """Convert a mirrored Product (with prefetched variants) into the dict we serve"""
+    return serialize_product({
+        "id": product.id,
+        "title": product.title,
+        "body_html": product.body_html,
+        "vendor": product.vendor,
+        "product_type": product.product_type,
+        "tags": product.tags,
+        "handle": product.handle,
+        "published_at": product.published_at.isoformat() if product.published_at else None,
+        "updated_at": product.shopify_updated_at.isoformat() if product.shopify_updated_at else None,
+        "variants": [
+            {
+                "id": variant.id,
+                "title": variant.title,
+                "sku": variant.sku,
+                "price": str(variant.price),
+                "compare_at_price": str(variant.compare_at_price) if variant.compare_at_price is not None else None,
+                "inventory_quantity": variant.inventory_quantity,
+                "requires_shipping": variant.requires_shipping,
+            }
+            for variant in product.variants.all()
+        ],
+    })
+
+
+def mirror_is_populated():
+    return Product.objects.exists()
+
+
+def mirrored_catalog():
+    """Return every active mirrored product, in id order, as the dicts we serve"""
+    products = Product.objects.filter(status='active').order_by('id').prefetch_related('variants')
+    return [serialize_mirrored_product(product) for product in products]
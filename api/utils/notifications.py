@@ -0,0 +1,275 @@
+"""
+Durable delivery of Discord webhook messages through the Notification outbox.
+
+send_discord_webhook() writes the message to the outbox in the caller's
+transaction, so it is recorded exactly when the change it announces
+commits, and costs the request one insert. Delivery happens off the
+request path, at least once:
+
+- Once the row commits, its id is handed to this process's
+  DiscordDispatcher, whose worker thread delivers it straight away.
+- The deliver_notifications command (its own process) delivers whatever
+  the dispatchers didn't: rows whose nudge was dropped or whose process
+  died, retries of failed deliveries, and digests.
+
+Notifications that can wait (e.g. low severity issues) are queued with
+digest=True and held until the end of the current DISCORD_DIGEST_INTERVAL
+window, then sent as one message. Everything else is packed into as few
+messages as Discord allows, so a burst of notifications costs a few
+requests rather than one each; see api.utils.discord_webhooks.
+
+Workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED and push their
+next_attempt_at out by CLAIM_LEASE, so several processes and machines can
+deliver at once without double-sending. A failed delivery is retried after
+NOTIFICATION_RETRY_BACKOFF seconds, doubling per attempt up to
+NOTIFICATION_RETRY_BACKOFF_MAX, until NOTIFICATION_MAX_ATTEMPTS.
+"""
+import atexit
+from datetime import datetime, timedelta, timezone as dt_timezone
+import logging
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import Notification
+from api.utils import metrics
+from api.utils.discord_webhooks import digest_message, pack_messages, post_message
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed notification is held before another worker may pick it up
+CLAIM_LEASE = timedelta(minutes=5)
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def digest_due_at(now):
+    """End of the DISCORD_DIGEST_INTERVAL window containing now; windows line up across processes"""
+    interval = settings.DISCORD_DIGEST_INTERVAL
+    return datetime.fromtimestamp((now.timestamp() // interval + 1) * interval, tz=dt_timezone.utc)
+
+
+def queue_notification(payload, digest=False):
+    """
+    Write a Discord message to the outbox and return its row.
+
+    Call inside the transaction that makes the change it announces. Once
+    that commits, this process's dispatcher is asked to deliver it. Digest
+    notifications instead wait for the end of the current digest window
+    (DISCORD_DIGEST_INTERVAL), when the outbox worker sends the window's
+    together; with no interval set they are sent like any other.
+    """
+    now = timezone.now()
+    digest = digest and settings.DISCORD_DIGEST_INTERVAL > 0
+    notification = Notification.objects.create(
+        payload=payload, digest=digest, next_attempt_at=digest_due_at(now) if digest else now)
+    if not digest:
+        transaction.on_commit(lambda: discord_dispatcher().enqueue(notification.pk))
+    metrics.incr('notifications.queued')
+    return notification
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next delivery attempt, after `attempts` failed ones"""
+    delay = min(settings.NOTIFICATION_RETRY_BACKOFF * 2 ** (attempts - 1), settings.NOTIFICATION_RETRY_BACKOFF_MAX)
+    # Spread out retries of notifications that failed together (e.g. in a Discord outage)
+    return delay * random.uniform(1, 1.25)
+
+
+def claim_notifications(limit, ids=None, digest=False):
+    """
+    Take up to limit notifications (digest ones, or the rest) that are due
+    for delivery, optionally only those in ids, oldest first.
+
+    Their next_attempt_at is pushed out by CLAIM_LEASE so concurrent workers
+    skip them; recording the outcome sets the real next attempt.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = Notification.objects.select_for_update(skip_locked=True).filter(
+            status='pending', digest=digest, next_attempt_at__lte=now)
+        if ids is not None:
+            rows = rows.filter(pk__in=ids)
+        notifications = list(rows.order_by('next_attempt_at', 'pk')[:limit])
+        Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(next_attempt_at=now + CLAIM_LEASE)
+    return notifications
+
+
+def record_delivery(notifications):
+    now = timezone.now()
+    for notification in notifications:
+        metrics.observe('notifications.delivery_delay', (now - notification.created_at).total_seconds())
+    Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(
+        status='delivered', delivered_at=now, next_attempt_at=None, attempts=F('attempts') + 1)
+    metrics.incr('notifications.delivered', len(notifications))
+
+
+def record_failure(notifications, error):
+    """
+    Schedule another attempt at notifications that went out in one failed
+    message (together, so they can be packed together again), or give up
+    on those that have used up NOTIFICATION_MAX_ATTEMPTS.
+    """
+    attempts = max(n.attempts for n in notifications) + 1
+    delay = retry_delay(attempts)
+    next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    for notification in notifications:
+        notification.attempts += 1
+        notification.last_error = str(error)[:1000]
+        if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            notification.status = 'failed'
+            notification.next_attempt_at = None
+            logger.error(f"Giving up on notification {notification.pk} after "
+                         f"{notification.attempts} attempts: {str(error)}")
+            metrics.incr('notifications.failed')
+        else:
+            notification.next_attempt_at = next_attempt_at
+            metrics.incr('notifications.retried')
+    Notification.objects.bulk_update(notifications, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+    retrying = sum(1 for n in notifications if n.status == 'pending')
+    if retrying:
+        logger.warning(f"Failed to send {retrying} notifications "
+                       f"(attempt {attempts}), retrying in {delay:.0f}s: {str(error)}")
+
+
+def send(notifications, message):
+    """Post one message carrying notifications and record the outcome for all of them"""
+    try:
+        post_message(message)
+    except Exception as e:
+        record_failure(notifications, e)
+        return False
+    record_delivery(notifications)
+    return True
+
+
+def deliver_due_notifications(limit=None, ids=None):
+    """
+    Claim and deliver due notifications (other than digests), packed into as
+    few messages as Discord allows; returns how many were claimed.
+    """
+    notifications = claim_notifications(limit or settings.NOTIFICATION_DELIVERY_BATCH, ids)
+    for message, indexes in pack_messages([n.payload for n in notifications]):
+        send([notifications[i] for i in indexes], message)
+    return len(notifications)
+
+
+def deliver_due_digest():
+    """
+    Send the notifications held for digest whose window has closed as one
+    message (summarized if they don't fit in one); returns how many were claimed.
+    """
+    notifications = claim_notifications(settings.NOTIFICATION_DIGEST_MAX, digest=True)
+    if notifications:
+        message = digest_message([n.payload for n in notifications], settings.DISCORD_DIGEST_INTERVAL)
+        send(notifications, message)
+    return len(notifications)
+
+
+class DiscordDispatcher:
+    """
+    Bounded queue of committed notification ids, delivered in order by one worker thread.
+
+    Ids queued while the worker is busy are delivered together, packed into
+    as few messages as possible. The queue only speeds delivery up: ids that are dropped (queue full,
+    process exiting) stay pending in the outbox for deliver_notifications.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.closed = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='discord-dispatcher', daemon=True)
+        self.thread.start()
+
+    def enqueue(self, notification_id):
+        """Ask the worker to deliver a notification; returns False if the request was dropped"""
+        if self.closed:
+            metrics.incr('discord.dropped')
+            return False
+        try:
+            self.queue.put_nowait((notification_id, time.monotonic()))
+        except queue.Full:
+            logger.warning("Discord queue is full (%d messages); leaving notification %s to the outbox worker",
+                           self.queue.maxsize, notification_id)
+            metrics.incr('discord.dropped')
+            return False
+        metrics.incr('discord.enqueued')
+        return True
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Whatever else is already waiting can share the message
+            while len(batch) < settings.NOTIFICATION_DELIVERY_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            started = time.monotonic()
+            for _, enqueued_at in batch:
+                metrics.observe('discord.queue_latency', started - enqueued_at)
+            ids = [notification_id for notification_id, _ in batch]
+            try:
+                deliver_due_notifications(len(ids), ids)
+            except Exception as e:
+                logger.error(f"Error delivering notifications {ids}: {str(e)}")
+            finally:
+                metrics.observe('discord.send_seconds', time.monotonic() - started)
+                close_old_connections()
+                for _ in batch:
+                    self.queue.task_done()
+
+    def drain(self, timeout):
+        """
+        Stop taking notifications and wait up to timeout seconds for the queued
+        ones to be delivered; returns how many were left to the outbox worker.
+        """
+        self.closed = True
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.queue.all_tasks_done.wait(remaining)
+            left = self.queue.unfinished_tasks
+        self.stopped.set()
+        if left:
+            logger.warning("Discord dispatcher shut down with %d notifications left to the outbox worker", left)
+            metrics.incr('discord.dropped', left)
+        return left
+
+
+def discord_dispatcher():
+    """
+    The process-wide dispatcher.
+
+    Created on first use so gunicorn workers don't inherit the worker thread
+    (which wouldn't survive the fork) from the master.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = DiscordDispatcher(settings.DISCORD_QUEUE_SIZE)
+            metrics.register_gauge('discord.queue_depth', _dispatcher.queue.qsize)
+            atexit.register(_dispatcher.drain, settings.DISCORD_DRAIN_TIMEOUT)
+        return _dispatcher
+
+
+def _outbox_backlog():
+    # Only pending rows have a next attempt; the filter uses its index
+    return Notification.objects.filter(next_attempt_at__isnull=False).count()
+
+
+metrics.register_gauge('notifications.pending', _outbox_backlog)
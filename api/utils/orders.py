@@ -0,0 +1,115 @@
+import logging
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from api.models import OrderIndex
+
+logger = logging.getLogger(__name__)
+
+INDEX_UPDATE_FIELDS = [
+    'shopify_id', 'email', 'phone_digits', 'created_at', 'shopify_updated_at', 'summary', 'synced_at',
+]
+
+
+def normalize_phone(phone):
+    return ''.join(filter(str.isdigit, phone or ''))
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_order_number(order_number):
+    return str(order_number).replace('#', '').strip()
+
+
+def order_summary(order):
+    """The fields an order lookup returns (no personal info), from a Shopify REST order dict"""
+    return {
+        "order_number": order["name"],
+        "created_at": order["created_at"],
+        "status": order["financial_status"],
+        "fulfillment_status": order["fulfillment_status"],
+        "line_items": [
+            {
+                "title": item["title"],
+                "quantity": item["quantity"],
+                "variant_title": item["variant_title"],
+            }
+            for item in order.get("line_items") or []
+        ],
+    }
+
+
+def order_index_row(order):
+    """Build an unsaved OrderIndex row from a Shopify REST order dict"""
+    return OrderIndex(
+        shopify_id=order["id"],
+        order_number=normalize_order_number(order["name"]),
+        email=normalize_email(order.get("email")),
+        phone_digits=normalize_phone(order.get("phone")),
+        created_at=parse_datetime(order["created_at"]) if order.get("created_at") else None,
+        shopify_updated_at=parse_datetime(order["updated_at"]) if order.get("updated_at") else None,
+        summary=order_summary(order),
+    )
+
+
+def index_orders(orders):
+    """
+    Insert or update Shopify REST order dicts in the order index; returns the number written.
+
+    Shopify doesn't deliver webhooks in order, so orders older (by
+    updated_at) than their indexed row are skipped.
+    """
+    rows = [order_index_row(order) for order in orders]
+    if not rows:
+        return 0
+    with transaction.atomic():
+        # Locked so a concurrent webhook for the same order waits for this one
+        indexed = dict(OrderIndex.objects.select_for_update()
+                       .filter(order_number__in=[row.order_number for row in rows])
+                       .values_list('order_number', 'shopify_updated_at'))
+        rows = [
+            row for row in rows
+            if not (row.shopify_updated_at and indexed.get(row.order_number)
+                    and row.shopify_updated_at < indexed[row.order_number])
+        ]
+        if rows:
+            OrderIndex.objects.bulk_create(
+                rows, update_conflicts=True,
+                unique_fields=['order_number'], update_fields=INDEX_UPDATE_FIELDS,
+            )
+    return len(rows)
+
+
+def indexed_order(order_number):
+    """Return the OrderIndex row for an order number, or None"""
+    return OrderIndex.objects.filter(order_number=normalize_order_number(order_number)).first()
+
+
+def phone_order_ids(digits, limit, before_id=None):
+    """
+    Shopify ids of indexed orders whose phone ends with digits, newest first.
+
+    Matches on the order's own phone, as lookups always have, so guest
+    checkouts and orders placed with another number than the customer's are
+    found. before_id continues after the last id of a previous page.
+    """
+    rows = OrderIndex.objects.filter(phone_digits__endswith=digits)
+    if before_id is not None:
+        rows = rows.filter(shopify_id__lt=before_id)
+    return list(rows.order_by('-shopify_id').values_list('shopify_id', flat=True)[:limit])
+
+
+def contact_matches(row, email=None, phone=None):
+    """
+    Check lookup contact details against an indexed order.
+
+    Phone numbers match when the order's digits end with the given digits, as
+    lookups always have.
+    """
+    if email and row.email and row.email == normalize_email(email):
+        return True
+    phone_digits = normalize_phone(phone)
+    return bool(phone_digits and row.phone_digits and row.phone_digits.endswith(phone_digits))
@@ -0,0 +1,121 @@
+import bisect
+import heapq
+import html
+import re
+import threading
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r'\w+')
+TAG_RE = re.compile(r'<[^>]+>')
+
+# How much a term counts depending on where it appears in a product
+FIELD_WEIGHTS = (
+    ('title', 8),
+    ('tags', 4),
+    ('vendor', 3),
+    ('product_type', 3),
+    ('description', 1),
+)
+EXACT_MATCH_BONUS = 2
+
+_latest_index = None
+_latest_index_lock = threading.Lock()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def strip_html(value):
+    """Cheap HTML-to-text for indexing; product descriptions don't need a full parser"""
+    return html.unescape(TAG_RE.sub(' ', value or ''))
+
+
+def document_terms(product):
+    """Return {term: weight} for a served product dict"""
+    weights = defaultdict(int)
+    for field, weight in FIELD_WEIGHTS:
+        value = product[field]
+        if field == 'tags':
+            value = ' '.join(value)
+        elif field == 'description':
+            value = strip_html(value)
+        for term in set(tokenize(value)):
+            weights[term] += weight
+    return dict(weights)
+
+
+class SearchIndex:
+    """
+    Inverted index over the text fields of one catalog generation.
+
+    Postings map each term to {catalog position: weight}. Terms are also kept
+    sorted so a query token matches every term it is a prefix of with a
+    bisect. Term weights per product are keyed by (id, updated_at) and reused
+    from the previous index, so a new catalog generation only re-tokenizes the
+    products that changed.
+    """
+
+    def __init__(self, products, previous=None):
+        reusable = previous.documents if previous is not None else {}
+        self.documents = {}
+        self.in_stock = [product["has_stock"] for product in products]
+        postings = defaultdict(dict)
+
+        for position, product in enumerate(products):
+            key = (product["id"], product["updated_at"])
+            weights = reusable.get(key)
+            if weights is None:
+                weights = document_terms(product)
+            self.documents[key] = weights
+            for term, weight in weights.items():
+                postings[term][position] = weight
+
+        self.postings = dict(postings)
+        self.terms = sorted(self.postings)
+
+    def _matching_terms(self, prefix):
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff', lo=start)
+        return self.terms[start:end]
+
+    def _token_scores(self, token):
+        """Return {position: score} of products matching token as a word or word prefix"""
+        scores = {}
+        for term in self._matching_terms(token):
+            bonus = EXACT_MATCH_BONUS if term == token else 1
+            for position, weight in self.postings[term].items():
+                score = weight * bonus
+                if score > scores.get(position, 0):
+                    scores[position] = score
+        return scores
+
+    def search(self, query, limit=20):
+        """
+        Return (positions, total) of products matching every token of query.
+
+        Every token may match as a prefix; exact word matches and matches in
+        more important fields score higher. Ties go to in-stock products, then
+        catalog order.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+
+        per_token = sorted((self._token_scores(token) for token in tokens), key=len)
+        scores = per_token[0]
+        for other in per_token[1:]:
+            scores = {position: score + other[position]
+                      for position, score in scores.items() if position in other}
+
+        ranked = heapq.nsmallest(limit, scores, key=lambda p: (-scores[p], not self.in_stock[p], p))
+        return ranked, len(scores)
+
+
+def build_search_index(products):
+    """Build a SearchIndex, reusing the term weights of the last index built in this process"""
+    global _latest_index
+    with _latest_index_lock:
+        index = SearchIndex(products, previous=_latest_index)
+        _latest_index = index
+    return index
@@ -0,0 +1,275 @@
+"""
+Shipments recorded from Shopify fulfillments, and the refresher that polls their carriers.
+
+Shipments are recorded when fulfillments arrive (webhooks) or are first
+seen by the orders endpoint. refresh_due_shipments() polls the ones whose
+next_check_at has passed and schedules the next check from how recently
+the parcel last moved: parcels out for delivery are polled every
+TRACKING_REFRESH_MIN_INTERVAL, quiet ones back off towards
+TRACKING_REFRESH_MAX_INTERVAL, and delivered ones are not polled again.
+Parcels Shopify itself reports delivered (the fulfillment's
+shipment_status, for carriers it tracks) are marked delivered without a
+poll; it is the only source of that for carriers whose pages can't be
+parsed.
+"""
+from datetime import timedelta
+import logging
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from api.models import Shipment, TrackingEvent
+from api.utils import metrics
+from api.utils.orders import normalize_order_number
+from api.utils.tracking import error_backoff, fetch_tracking_status, tracking_executor
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed shipment is held before another refresher may pick it up
+CLAIM_LEASE = timedelta(minutes=5)
+
+OUT_FOR_DELIVERY_RE = re.compile(r'out for delivery|with delivery courier|on .*vehicle for delivery', re.IGNORECASE)
+
+# Fulfillments in these states will never ship
+DEAD_FULFILLMENT_STATUSES = {'cancelled', 'error', 'failure'}
+
+SHIPMENT_UPDATE_FIELDS = [
+    'tracking_url', 'tracking_company', 'shopify_order_id', 'order_number', 'fulfillment_id',
+]
+
+
+def fulfillment_shipments(fulfillment, order_number=''):
+    """Build unsaved Shipment rows for each tracking number of a Shopify REST fulfillment dict"""
+    if fulfillment.get("status") in DEAD_FULFILLMENT_STATUSES:
+        return []
+    numbers = fulfillment.get("tracking_numbers") or (
+        [fulfillment["tracking_number"]] if fulfillment.get("tracking_number") else [])
+    urls = fulfillment.get("tracking_urls") or (
+        [fulfillment["tracking_url"]] if fulfillment.get("tracking_url") else [])
+    if not order_number and fulfillment.get("name"):
+        order_number = fulfillment["name"].split('.')[0]  # "#1001.1" is fulfillment 1 of order #1001
+
+    delivered = fulfillment.get("shipment_status") == 'delivered'
+    now = timezone.now()
+    return [
+        Shipment(
+            tracking_number=number,
+            tracking_url=url,
+            tracking_company=fulfillment.get("tracking_company") or '',
+            shopify_order_id=fulfillment.get("order_id"),
+            order_number=normalize_order_number(order_number),
+            fulfillment_id=fulfillment.get("id"),
+            # Without a URL there is no page to poll, and once delivered nothing to poll for
+            status='delivered' if delivered else 'pending' if url else 'untracked',
+            next_check_at=now if url and not delivered else None,
+        )
+        for number, url in zip(numbers, urls + [''] * (len(numbers) - len(urls)))
+    ]
+
+
+def record_shipments(rows):
+    """Insert new shipments and update the fulfillment details of known ones; returns the number written"""
+    if rows:
+        # A tracking number can appear twice in one batch; the last one wins as it would in a loop
+        rows = list({row.tracking_number: row for row in rows}.values())
+        Shipment.objects.bulk_create(
+            rows, update_conflicts=True,
+            unique_fields=['tracking_number'], update_fields=SHIPMENT_UPDATE_FIELDS,
+        )
+        # Untracked shipments whose fulfillment has since been given a URL can be polled now
+        Shipment.objects.filter(
+            tracking_number__in=[row.tracking_number for row in rows], status='untracked',
+        ).exclude(tracking_url='').update(status='pending', next_check_at=timezone.now())
+        delivered = Shipment.objects.filter(
+            tracking_number__in=[row.tracking_number for row in rows if row.status == 'delivered'],
+        ).exclude(status='delivered').update(status='delivered', next_check_at=None, last_changed_at=timezone.now())
+        if delivered:
+            metrics.incr('shipments.delivered', delivered)
+    return len(rows)
+
+
+def record_fulfillment(fulfillment):
+    return record_shipments(fulfillment_shipments(fulfillment))
+
+
+def record_order_shipments(orders):
+    """Record the shipments of every fulfillment on Shopify REST order dicts"""
+    return record_shipments([
+        row
+        for order in orders
+        for fulfillment in order.get("fulfillments") or []
+        for row in fulfillment_shipments({"order_id": order.get("id"), **fulfillment}, order.get("name", ''))
+    ])
+
+
+def order_shipments(orders):
+    """
+    Return {order id: [Shipment]} for Shopify REST order dicts, in fulfillment order.
+
+    Shipments not seen before are recorded (and so queued for the refresher)
+    first, so every tracking number on the orders has a row. A tracking
+    number on several orders (split or combined shipments) is listed under
+    each of them.
+    """
+    rows = {
+        (order.get("id"), row.tracking_number): row
+        for order in orders
+        for fulfillment in order.get("fulfillments") or []
+        for row in fulfillment_shipments({"order_id": order.get("id"), **fulfillment}, order.get("name", ''))
+    }
+    known = Shipment.objects.in_bulk(list({number for _, number in rows}), field_name='tracking_number')
+    missing = {row.tracking_number: row for row in rows.values() if row.tracking_number not in known}
+    if missing:
+        Shipment.objects.bulk_create(list(missing.values()), ignore_conflicts=True)
+        known.update(Shipment.objects.in_bulk(list(missing), field_name='tracking_number'))
+
+    shipments = {}
+    for order_id, number in rows:
+        if number in known:
+            shipments.setdefault(order_id, []).append(known[number])
+    return shipments
+
+
+def stored_shipment(tracking_number):
+    """Return the Shipment for a tracking number with its events prefetched, or None"""
+    return (Shipment.objects.prefetch_related('events')
+            .filter(tracking_number=tracking_number.strip()).first())
+
+
+def shipment_status(shipment):
+    """The tracking status the orders endpoint serves for a shipment"""
+    return {
+        'url': shipment.tracking_url or None,
+        'tracking_number': shipment.tracking_number,
+        'carrier': shipment.carrier or None,
+        'status': shipment.status,
+        'last_event': shipment.last_event,
+        'eta': shipment.eta or None,
+        'checked_at': shipment.last_checked_at.isoformat() if shipment.last_checked_at else None,
+    }
+
+
+def serialize_shipment(shipment):
+    """A shipment with its full event history, newest first"""
+    return {
+        **shipment_status(shipment),
+        'tracking_company': shipment.tracking_company or None,
+        'events': [
+            {
+                'description': event.description,
+                'location': event.location or None,
+                'time': event.time or None,
+                'status': event.status,
+                'recorded_at': event.recorded_at.isoformat(),
+            }
+            for event in shipment.events.all()
+        ],
+    }
+
+
+def next_check_delay(shipment, now):
+    """Seconds until shipment should be polled again, or None to stop polling it"""
+    if shipment.status == 'delivered':
+        return None
+    if now - shipment.created_at > timedelta(seconds=settings.TRACKING_REFRESH_MAX_AGE):
+        return None
+    if shipment.status == 'error':
+        return error_backoff(shipment.failures)
+
+    event = shipment.last_event or {}
+    if OUT_FOR_DELIVERY_RE.search(event.get('description') or ''):
+        return settings.TRACKING_REFRESH_MIN_INTERVAL
+    # The longer a parcel has sat unchanged, the less often it is worth checking
+    quiet = (now - (shipment.last_changed_at or shipment.created_at)).total_seconds()
+    return min(max(quiet / 4, settings.TRACKING_REFRESH_MIN_INTERVAL), settings.TRACKING_REFRESH_MAX_INTERVAL)
+
+
+def apply_tracking_result(shipment, result, now=None):
+    """Update a shipment (and its event history) from a fetch_tracking_status() result"""
+    now = now or timezone.now()
+    status = result['status']
+    shipment.last_checked_at = now
+
+    if status == 'error':
+        shipment.failures += 1
+        if shipment.status == 'pending':
+            shipment.status = 'error'
+    else:
+        event = result.get('last_event')
+        if status != shipment.status or event != shipment.last_event:
+            shipment.last_changed_at = now
+        shipment.status = status
+        shipment.failures = 0
+        shipment.carrier = result.get('carrier') or ''
+        shipment.last_event = event
+        shipment.eta = result.get('eta') or ''
+        if event:
+            try:
+                with transaction.atomic():
+                    TrackingEvent.objects.create(
+                        shipment=shipment,
+                        description=event['description'][:500],
+                        location=(event.get('location') or '')[:255],
+                        time=(event.get('time') or '')[:64],
+                        status=status,
+                    )
+            except IntegrityError:
+                pass  # Already recorded on an earlier poll
+
+    delay = next_check_delay(shipment, now)
+    shipment.next_check_at = now + timedelta(seconds=delay) if delay is not None else None
+    shipment.save()
+    if status == 'delivered':
+        metrics.incr('shipments.delivered')
+
+
+def claim_due_shipments(limit):
+    """
+    Take up to limit shipments that are due for a check.
+
+    Their next_check_at is pushed out by CLAIM_LEASE so concurrent
+    refreshers skip them; applying a result sets the real next check.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        shipments = list(
+            Shipment.objects.select_for_update(skip_locked=True)
+            .filter(next_check_at__lte=now)
+            .order_by('next_check_at')[:limit]
+        )
+        Shipment.objects.filter(pk__in=[s.pk for s in shipments]).update(next_check_at=now + CLAIM_LEASE)
+    return shipments
+
+
+def check_tracking_url(url):
+    """fetch_tracking_status() for a tracking pool thread, which then hands back its database connection"""
+    try:
+        return fetch_tracking_status(url)
+    finally:
+        close_old_connections()
+
+
+def refresh_due_shipments(limit=None):
+    """Poll the carriers of due shipments on the tracking pool; returns how many were checked"""
+    shipments = claim_due_shipments(limit or settings.TRACKING_REFRESH_BATCH)
+    if not shipments:
+        return 0
+
+    executor = tracking_executor()
+    futures = [executor.submit(check_tracking_url, s.tracking_url) for s in shipments]
+    for shipment, future in zip(shipments, futures):
+        try:
+            try:
+                result = future.result()
+            except Exception as e:
+                # Counts as a failed check, so the shipment backs off instead of waiting out its lease
+                logger.error(f"Error checking shipment {shipment.tracking_number}: {str(e)}")
+                result = {'url': shipment.tracking_url, 'status': 'error', 'error': str(e)}
+            apply_tracking_result(shipment, result)
+        except Exception as e:
+            logger.error(f"Error updating shipment {shipment.tracking_number}: {str(e)}")
+    metrics.incr('shipments.refreshed', len(shipments))
+    logger.info(f"Refreshed {len(shipments)} shipments")
+    return len(shipments)
@@ -1,26 +1,222 @@
 import os
+import json
 import logging
+import queue
+import threading
+import concurrent.futures
+from urllib.parse import urlencode
 from django.conf import settings
 import shopify
 
+from api.utils import shopify_throttle
+
 logger = logging.getLogger(__name__)
 
-def init_shopify():
-    """Initialize Shopify API connection"""
+_PAGES_DONE = object()
+
+SHOPIFY_API_VERSION = '2023-04'
+
+_session_state = None
+_session_lock = threading.Lock()
+
+
+def configure_shopify(site, url, version, access_token):
+    """Set the process-wide Shopify session that init_shopify() activates"""
+    global _session_state
+    shopify_throttle.install()
+    with _session_lock:
+        _session_state = {
+            'site': site,
+            'url': url,
+            'version': version,
+            'headers': {'X-Shopify-Access-Token': access_token},
+        }
+        return _session_state
+
+
+def process_session():
+    """The process-wide Shopify session, built from settings on first use"""
+    with _session_lock:
+        state = _session_state
+    if state is not None:
+        return state
+
     shop_url = settings.SHOPIFY_SHOP_URL
-    if not shop_url.endswith('.myshopify.com'):
-        shop_url = f"{shop_url}.myshopify.com"
     access_token = settings.SHOPIFY_ACCESS_TOKEN
-
     if not shop_url or not access_token:
         raise ValueError("SHOPIFY_SHOP_URL and SHOPIFY_ACCESS_TOKEN must be set")
+    if not shop_url.endswith('.myshopify.com'):
+        shop_url = f"{shop_url}.myshopify.com"
 
-    logger.info(f"Initializing Shopify session with shop URL: {shop_url}")
     try:
-        session = shopify.Session(shop_url, '2023-04', access_token)
-        shopify.ShopifyResource.activate_session(session)
-        logger.info("Shopify session initialized successfully")
+        session = shopify.Session(shop_url, SHOPIFY_API_VERSION, access_token)
     except Exception as e:
         error_msg = f"Failed to initialize Shopify session: {str(e)}"
         logger.error(error_msg)
-        raise ValueError(error_msg)
\ No newline at end of file
+        raise ValueError(error_msg)
+    logger.info(f"Created Shopify session for {session.url}")
+    return configure_shopify(session.site, session.url, session.api_version.name, session.token)
+
+
+def init_shopify():
+    """
+    Activate the process-wide Shopify session on the calling thread.
+
+    The session is created once per process. Activation only sets this
+    thread's ShopifyResource state (never the class-wide defaults that
+    shopify.ShopifyResource.activate_session() writes), so requests on other
+    threads cannot see or disturb it, and calling it again is cheap.
+    """
+    restore_session(process_session())
+
+def capture_session():
+    """Snapshot the Shopify session active on this thread"""
+    # ShopifyResource keeps site and headers (including the access token) per
+    # thread, so worker threads have to re-activate the caller's session.
+    resource = shopify.ShopifyResource
+    return {
+        'site': resource.site,
+        'url': resource.url,
+        'version': resource.version,
+        'headers': dict(resource.headers),
+    }
+
+
+def restore_session(state):
+    """Activate a session (from process_session() or capture_session()) on this thread only"""
+    local = shopify.ShopifyResource._threadlocal
+    if getattr(local, 'site', None) != state['site']:
+        local.connection = None  # built lazily from the thread's site on the next request
+    local.site = state['site']
+    local.url = state['url']
+    local.version = state['version']
+    local.user = None
+    local.password = None
+    local.headers = dict(state['headers'])
+    local.timeout = settings.SHOPIFY_REQUEST_TIMEOUT  # read when the connection is built
+
+
+def fetch_page(collection, url=None, key=None, **params):
+    """
+    Fetch one page of a REST collection (e.g. 'products', 'orders') as plain dicts.
+
+    key is the collection's name in the response body when it differs from
+    the path (e.g. 'orders' for 'customers/<id>/orders').
+
+    Returns (items, next_page_url). This deliberately skips ActiveResource:
+    building resource objects costs far more CPU than the HTTP round trip on
+    250-item pages, and callers only need the JSON.
+    """
+    resource = shopify.ShopifyResource
+    if url is None:
+        url = f"{resource.site}/{collection}.json?{urlencode(params)}"
+    response = resource.connection.get(url, resource.headers)
+    items = json.loads(response.body)[key or collection]
+    return items, _next_page_url(response.headers)
+
+
+def fetch_products_page(url=None, **params):
+    """Fetch one page of products as plain dicts; see fetch_page()"""
+    return fetch_page('products', url, **params)
+
+
+def iter_pages(collection, **params):
+    """Yield every page of a REST collection, following page_info cursors with limit=250"""
+    params.setdefault('limit', 250)
+    items, next_url = fetch_page(collection, **params)
+    yield items
+    while next_url:
+        items, next_url = fetch_page(collection, next_url)
+        yield items
+
+
+def _next_page_url(headers):
+    link = headers.get('Link') or headers.get('link')
+    if not link:
+        return None
+    for value in link.split(', '):
+        url, rel = value.split('; ')
+        if rel == 'rel="next"':
+            return url[1:-1]
+    return None
+
+
+def iter_product_pages(prefetch=2, **params):
+    """
+    Yield pages of product dicts, following page_info cursors with limit=250.
+
+    Pages are fetched on a background thread up to `prefetch` pages ahead, so
+    the caller's per-product processing overlaps with the next page's I/O.
+    """
+    params.setdefault('limit', 250)
+    session_state = capture_session()
+    pages = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer stopped iterating, instead of blocking forever
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            restore_session(session_state)
+            products, next_url = fetch_products_page(**params)
+            while put(products) and next_url:
+                products, next_url = fetch_products_page(next_url)
+        except Exception as e:
+            put(e)
+        finally:
+            put(_PAGES_DONE)
+
+    producer = threading.Thread(target=produce, name='shopify-page-fetcher', daemon=True)
+    producer.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is _PAGES_DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
+
+
+def iter_product_pages_parallel(max_workers=4, **params):
+    """
+    Yield pages of product dicts fetched concurrently by disjoint ID ranges.
+
+    A cheap pass pages through product IDs only (fields=id). Each ID page is a
+    sorted, disjoint range of up to 250 products, which is handed to a pool of
+    at most `max_workers` threads as soon as it arrives, so the full-product
+    fetches overlap with the rest of the ID pass. Pages are yielded as they
+    complete, not in ID order.
+    """
+    session_state = capture_session()
+
+    def fetch_range(ids):
+        restore_session(session_state)
+        products, _ = fetch_products_page(ids=','.join(str(i) for i in ids), limit=250, **params)
+        return products
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        try:
+            for id_page in iter_product_pages(fields='id', **params):
+                if id_page:
+                    pending.add(executor.submit(fetch_range, [p['id'] for p in id_page]))
+                for future in [f for f in pending if f.done()]:
+                    pending.discard(future)
+                    yield future.result()
+
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,346 @@
+"""
+Catalog fetchers built on the Shopify Admin GraphQL API.
+
+The REST products endpoint returns every product attribute, image and option;
+these queries ask for exactly the fields the catalog serves (plus the ids the
+product mirror needs). Results are converted to the same dict shape as REST
+product payloads, so serialize_product() and the mirror work unchanged.
+
+Two modes:
+- iter_graphql_product_pages() pages through `products` with cursors. Page
+  sizes are kept small enough that a query stays under Shopify's 1000-point
+  cost limit.
+- iter_bulk_product_pages() runs a bulk operation, which has no cost limit,
+  then streams the resulting JSONL file line by line instead of loading it.
+"""
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+import requests
+import shopify
+
+from api.utils import metrics
+from api.utils.shopify_throttle import bucket_for, parse_retry_after, wait_out_throttle
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 20
+VARIANTS_PAGE_SIZE = 20
+BULK_POLL_INTERVAL = 2
+BULK_TIMEOUT = 30 * 60
+# Cost reserved for an operation until Shopify has reported what it actually costs
+DEFAULT_QUERY_COST = 50
+
+PRODUCT_FIELDS = '''
+    id
+    legacyResourceId
+    title
+    descriptionHtml
+    vendor
+    productType
+    tags
+    handle
+    status
+    publishedAt
+    updatedAt
+'''
+
+VARIANT_FIELDS = '''
+    legacyResourceId
+    title
+    sku
+    price
+    compareAtPrice
+    position
+    inventoryQuantity
+    inventoryItem { legacyResourceId requiresShipping }
+'''
+
+CATALOG_PAGE_QUERY = '''
+query CatalogPage($first: Int!, $after: String, $query: String, $variantsFirst: Int!) {
+  products(first: $first, after: $after, query: $query, sortKey: ID) {
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      %s
+      variants(first: $variantsFirst) {
+        pageInfo { hasNextPage endCursor }
+        nodes { %s }
+      }
+    }
+  }
+}
+''' % (PRODUCT_FIELDS, VARIANT_FIELDS)
+
+PRODUCT_VARIANTS_QUERY = '''
+query ProductVariants($id: ID!, $first: Int!, $after: String) {
+  product(id: $id) {
+    variants(first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { %s }
+    }
+  }
+}
+''' % VARIANT_FIELDS
+
+BULK_PRODUCTS_QUERY = '''
+{
+  products%s {
+    edges {
+      node {
+        %s
+        variants {
+          edges { node { %s } }
+        }
+      }
+    }
+  }
+}
+'''
+
+BULK_RUN_MUTATION = '''
+mutation BulkCatalog($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+'''
+
+CURRENT_BULK_OPERATION_QUERY = '''
+query CurrentBulkOperation {
+  currentBulkOperation { id status errorCode objectCount url }
+}
+'''
+
+
+class ShopifyGraphQLError(Exception):
+    pass
+
+
+# Operation name -> last reported cost, reserved from the bucket before each call
+_query_costs = {}
+
+
+def post_query(query, variables=None, operation_name=None):
+    """
+    POST a query to the active session's GraphQL endpoint and return the body.
+
+    What shopify.GraphQL().execute() does, but with SHOPIFY_REQUEST_TIMEOUT:
+    it calls urlopen() without one, so a stalled request would never return.
+    Raises urllib's HTTPError for non-2xx responses, as it does.
+    """
+    client = shopify.GraphQL()
+    headers = {"Accept": "application/json", "Content-Type": "application/json", **client.headers}
+    body = json.dumps({"query": query, "variables": variables, "operationName": operation_name}).encode('utf-8')
+    request = urllib.request.Request(client.endpoint, body, headers)
+    with urllib.request.urlopen(request, timeout=settings.SHOPIFY_REQUEST_TIMEOUT) as response:
+        return response.read().decode('utf-8')
+
+
+def execute(query, variables=None, operation_name=None):
+    """
+    Run a GraphQL query through the shop's GraphQL bucket and return its data.
+
+    Each call reserves the operation's expected cost; the bucket's level is
+    updated from the response's throttleStatus. THROTTLED errors and 429s
+    are retried once the bucket has room, up to SHOPIFY_MAX_RETRIES times.
+    """
+    bucket = bucket_for(shopify.ShopifyResource.site, 'graphql')
+    for attempt in range(settings.SHOPIFY_MAX_RETRIES + 1):
+        cost = _query_costs.get(operation_name, DEFAULT_QUERY_COST)
+        bucket.acquire(cost)
+        try:
+            result = json.loads(post_query(query, variables, operation_name))
+        except urllib.error.HTTPError as e:
+            bucket.release(cost)
+            if e.code != 429 or attempt == settings.SHOPIFY_MAX_RETRIES:
+                raise
+            wait_out_throttle(bucket, parse_retry_after(dict(e.headers)), attempt)
+            continue
+        except Exception:
+            bucket.release(cost)
+            raise
+
+        cost_info = result.get('extensions', {}).get('cost', {})
+        throttle = cost_info.get('throttleStatus')
+        if throttle:
+            bucket.release(
+                cost,
+                level=throttle['maximumAvailable'] - throttle['currentlyAvailable'],
+                capacity=throttle['maximumAvailable'],
+                leak_rate=throttle['restoreRate'],
+            )
+        else:
+            bucket.release(cost)
+        if cost_info.get('requestedQueryCost'):
+            _query_costs[operation_name] = cost_info['requestedQueryCost']
+
+        errors = result.get('errors')
+        if not errors:
+            return result['data']
+        throttled = any(e.get('extensions', {}).get('code') == 'THROTTLED' for e in errors)
+        if not throttled or attempt == settings.SHOPIFY_MAX_RETRIES:
+            raise ShopifyGraphQLError('; '.join(e.get('message', str(e)) for e in errors))
+        # The next acquire() waits until the bucket has refilled enough for the requested cost
+        metrics.incr('shopify.throttled')
+        logger.info("Shopify GraphQL throttled; retrying when %s points are available",
+                    cost_info.get('requestedQueryCost'))
+
+
+def search_query(params):
+    """Translate the REST filters the catalog uses into a products search query"""
+    terms = []
+    for name, value in params.items():
+        if name == 'status':
+            terms.append(f"status:{value}")
+        elif name == 'updated_at_min':
+            terms.append(f"updated_at:>='{value}'")
+        elif name != 'limit':
+            raise ValueError(f"Unsupported product filter for GraphQL: {name}")
+    return ' AND '.join(terms) or None
+
+
+def _legacy_id(node):
+    return int(node['legacyResourceId'])
+
+
+def rest_variant(node, product_id):
+    """Convert a GraphQL variant node into a REST-shaped variant dict"""
+    inventory_item = node.get('inventoryItem') or {}
+    return {
+        "id": _legacy_id(node),
+        "product_id": product_id,
+        "title": node['title'],
+        "sku": node['sku'],
+        "price": node['price'],
+        "compare_at_price": node['compareAtPrice'],
+        "position": node['position'],
+        "inventory_quantity": node['inventoryQuantity'],
+        "inventory_item_id": int(inventory_item['legacyResourceId']) if inventory_item else None,
+        "requires_shipping": inventory_item.get('requiresShipping', True),
+    }
+
+
+def rest_product(node, variant_nodes):
+    """Convert a GraphQL product node and its variant nodes into a REST-shaped product dict"""
+    product_id = _legacy_id(node)
+    return {
+        "id": product_id,
+        "title": node['title'],
+        "body_html": node['descriptionHtml'],
+        "vendor": node['vendor'],
+        "product_type": node['productType'],
+        "tags": ', '.join(node['tags']),
+        "handle": node['handle'],
+        "status": node['status'].lower(),
+        "published_at": node['publishedAt'],
+        "updated_at": node['updatedAt'],
+        "variants": [rest_variant(variant, product_id) for variant in variant_nodes],
+    }
+
+
+def _remaining_variants(product_gid, after):
+    """Fetch the variants of a product beyond its first page"""
+    nodes = []
+    while after:
+        data = execute(PRODUCT_VARIANTS_QUERY, {
+            'id': product_gid, 'first': 100, 'after': after,
+        }, 'ProductVariants')
+        variants = data['product']['variants']
+        nodes.extend(variants['nodes'])
+        after = variants['pageInfo']['endCursor'] if variants['pageInfo']['hasNextPage'] else None
+    return nodes
+
+
+def iter_graphql_product_pages(**params):
+    """Yield pages of REST-shaped product dicts fetched with paginated GraphQL queries"""
+    variables = {
+        'first': PAGE_SIZE,
+        'after': None,
+        'query': search_query(params),
+        'variantsFirst': VARIANTS_PAGE_SIZE,
+    }
+    while True:
+        products = execute(CATALOG_PAGE_QUERY, variables, 'CatalogPage')['products']
+
+        page = []
+        for node in products['nodes']:
+            variant_nodes = node['variants']['nodes']
+            if node['variants']['pageInfo']['hasNextPage']:
+                variant_nodes = variant_nodes + _remaining_variants(
+                    node['id'], node['variants']['pageInfo']['endCursor'])
+            page.append(rest_product(node, variant_nodes))
+        yield page
+
+        if not products['pageInfo']['hasNextPage']:
+            return
+        variables['after'] = products['pageInfo']['endCursor']
+
+
+def run_bulk_query(query):
+    """Start a bulk operation for query and return the URL of its JSONL result, or None if empty"""
+    result = execute(BULK_RUN_MUTATION, {'query': query}, 'BulkCatalog')['bulkOperationRunQuery']
+    if result['userErrors']:
+        raise ShopifyGraphQLError('; '.join(e['message'] for e in result['userErrors']))
+    operation_id = result['bulkOperation']['id']
+    logger.info("Started Shopify bulk operation %s", operation_id)
+
+    deadline = time.monotonic() + BULK_TIMEOUT
+    while time.monotonic() < deadline:
+        operation = execute(CURRENT_BULK_OPERATION_QUERY, operation_name='CurrentBulkOperation')['currentBulkOperation']
+        if operation is None or operation['id'] != operation_id:
+            raise ShopifyGraphQLError(f"Bulk operation {operation_id} is no longer current")
+        if operation['status'] == 'COMPLETED':
+            logger.info("Bulk operation %s completed with %s objects", operation_id, operation['objectCount'])
+            return operation['url']
+        if operation['status'] in ('FAILED', 'CANCELED', 'EXPIRED'):
+            raise ShopifyGraphQLError(
+                f"Bulk operation {operation_id} {operation['status'].lower()}: {operation['errorCode']}")
+        time.sleep(BULK_POLL_INTERVAL)
+    raise ShopifyGraphQLError(f"Bulk operation {operation_id} did not finish in {BULK_TIMEOUT}s")
+
+
+def iter_bulk_lines(url):
+    """Stream the JSONL result of a bulk operation one decoded line at a time"""
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def iter_bulk_product_pages(page_size=250, **params):
+    """
+    Yield pages of REST-shaped product dicts from a bulk operation.
+
+    In the JSONL result each variant is its own line, pointing at its product
+    through __parentId and following it, so a product is complete once the
+    next product line starts. Only one product and one page are held at a time.
+    """
+    query = search_query(params)
+    arguments = f'(query: {json.dumps(query)})' if query else ''
+    url = run_bulk_query(BULK_PRODUCTS_QUERY % (arguments, PRODUCT_FIELDS, VARIANT_FIELDS))
+    if url is None:
+        return
+
+    page = []
+    product, variants = None, []
+    for line in iter_bulk_lines(url):
+        if '__parentId' in line:
+            variants.append(line)
+            continue
+        if product is not None:
+            page.append(rest_product(product, variants))
+            if len(page) >= page_size:
+                yield page
+                page = []
+        product, variants = line, []
+
+    if product is not None:
+        page.append(rest_product(product, variants))
+    if page:
+        yield page
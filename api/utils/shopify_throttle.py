@@ -0,0 +1,225 @@
+"""
+Client-side rate limiting for Shopify Admin API calls.
+
+Shopify meters each app's calls to a shop with a leaky bucket. A REST call
+takes 1 from a bucket of 40 (80 on Plus) that drains at 2 per second; a
+GraphQL query takes its cost from a bucket of 1000 points. Calling with
+the bucket full gets a 429 with Retry-After.
+
+Every call goes through the ShopifyBucket for its shop and API, which:
+
+- tracks the level from each response (X-Shopify-Shop-Api-Call-Limit, or
+  the GraphQL throttleStatus) and estimates the drain in between;
+- lets only as many calls run at once as the bucket has room for, at most
+  SHOPIFY_MAX_CONCURRENCY, and queues the rest, so callers slow down as
+  the bucket fills instead of failing;
+- retries 429s after Retry-After plus a jittered exponential backoff.
+
+Levels are tracked per process. Other processes (gunicorn workers, the
+management commands) drain the same bucket, which is why every response's
+reading replaces the estimate, and why some headroom is kept free.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+import pyactiveresource.connection
+import shopify
+
+from api.utils import metrics
+
+REST_BUCKET_SIZE = 40
+GRAPHQL_BUCKET_SIZE = 1000
+GRAPHQL_RESTORE_RATE = 50
+
+# Fraction of the bucket left free for other processes using the same app
+HEADROOM = 0.1
+
+CALL_LIMIT_HEADER = 'X-Shopify-Shop-Api-Call-Limit'
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class ShopifyBucket:
+    """Process-local view of one shop's leaky bucket for one API ('rest' or 'graphql')"""
+
+    def __init__(self, capacity, leak_rate):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.in_flight_cost = 0
+        self.blocked_until = 0.0
+        self.condition = threading.Condition()
+
+    def _current_level(self, now):
+        return max(self.level - (now - self.updated) * self.leak_rate, 0.0)
+
+    def utilization(self):
+        with self.condition:
+            return self._current_level(time.monotonic()) / self.capacity
+
+    def acquire(self, cost=1):
+        """Wait until a call costing `cost` fits in the bucket, then count it as in flight"""
+        started = time.monotonic()
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    self.condition.wait(self.blocked_until - now)
+                    continue
+                limit = self.capacity * (1 - HEADROOM)
+                projected = self._current_level(now) + self.in_flight_cost + cost
+                if self.in_flight == 0 and projected <= self.capacity:
+                    break
+                if self.in_flight < settings.SHOPIFY_MAX_CONCURRENCY and projected <= limit:
+                    break
+                # Woken early by a finishing call, or once enough has drained
+                self.condition.wait(max((projected - limit) / self.leak_rate, 0.05))
+            self.in_flight += 1
+            self.in_flight_cost += cost
+
+        waited = time.monotonic() - started
+        if waited > 0.01:
+            metrics.observe('shopify.bucket_wait', waited)
+
+    def release(self, cost=1, level=None, capacity=None, leak_rate=None):
+        """Finish an in-flight call, with the bucket reading from its response if there was one"""
+        with self.condition:
+            now = time.monotonic()
+            self.in_flight -= 1
+            self.in_flight_cost -= cost
+            if capacity:
+                self.capacity = capacity
+            if leak_rate:
+                self.leak_rate = leak_rate
+            self.level = level if level is not None else self._current_level(now) + cost
+            self.updated = now
+            self.condition.notify_all()
+
+    def throttled(self, retry_after):
+        """Record a 429: treat the bucket as full and hold every caller for retry_after seconds"""
+        with self.condition:
+            now = time.monotonic()
+            self.level = self.capacity
+            self.updated = now
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+def bucket_for(site, api='rest'):
+    """The process-wide bucket for a shop's REST or GraphQL API"""
+    key = ((urlparse(site).hostname or site), api)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            if api == 'graphql':
+                bucket = ShopifyBucket(GRAPHQL_BUCKET_SIZE, GRAPHQL_RESTORE_RATE)
+            else:
+                bucket = ShopifyBucket(REST_BUCKET_SIZE, settings.SHOPIFY_REST_LEAK_RATE)
+            _buckets[key] = bucket
+        return bucket
+
+
+def header(headers, name):
+    """Case-insensitive header lookup on a plain dict"""
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def parse_call_limit(headers):
+    """Return (used, capacity) from X-Shopify-Shop-Api-Call-Limit ('32/40'), or (None, None)"""
+    value = header(headers, CALL_LIMIT_HEADER)
+    try:
+        used, capacity = value.split('/')
+        return int(used), int(capacity)
+    except (AttributeError, ValueError):
+        return None, None
+
+
+def parse_retry_after(headers):
+    try:
+        return float(header(headers, 'Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def wait_out_throttle(bucket, retry_after, attempt):
+    """
+    Hold the bucket for Retry-After (or an exponential backoff without one),
+    then sleep a random extra share of the backoff so callers throttled
+    together don't all retry at once.
+    """
+    backoff = settings.SHOPIFY_RETRY_BACKOFF * 2 ** attempt
+    bucket.throttled(retry_after if retry_after is not None else backoff)
+    metrics.incr('shopify.throttled')
+    time.sleep(random.uniform(0, backoff))
+
+
+def call_rest(site, call):
+    """
+    Run call() (one pyactiveresource request) through the shop's REST bucket.
+
+    429 responses are retried up to SHOPIFY_MAX_RETRIES times; the last one
+    is raised as pyactiveresource's ClientError, as it was before.
+    """
+    bucket = bucket_for(site)
+    for attempt in range(settings.SHOPIFY_MAX_RETRIES + 1):
+        bucket.acquire()
+        try:
+            response = call()
+        except pyactiveresource.connection.ClientError as e:
+            used, capacity = parse_call_limit(e.response.headers)
+            bucket.release(level=used, capacity=capacity)
+            if e.response.code != 429 or attempt == settings.SHOPIFY_MAX_RETRIES:
+                raise
+            wait_out_throttle(bucket, parse_retry_after(e.response.headers), attempt)
+            continue
+        except Exception:
+            bucket.release()
+            raise
+        used, capacity = parse_call_limit(response.headers)
+        bucket.release(level=used, capacity=capacity)
+        return response
+
+
+class RateLimitedConnection(pyactiveresource.connection.Connection):
+    """Drop-in for ShopifyAPI's ShopifyConnection whose requests go through the shop's REST bucket"""
+    response = None
+
+    def _open(self, *args, **kwargs):
+        # Keep the last response on the connection, as ShopifyConnection does for pagination
+        self.response = None
+        try:
+            self.response = call_rest(
+                self.site, lambda: super(RateLimitedConnection, self)._open(*args, **kwargs))
+        except pyactiveresource.connection.ConnectionError as err:
+            self.response = err.response
+            raise
+        return self.response
+
+
+def install():
+    """
+    Route every ShopifyResource request (ActiveResource finds and fetch_page) through the REST bucket.
+
+    ShopifyAPI builds each thread's connection from shopify.base.ShopifyConnection,
+    so swapping that class is the one place all REST calls pass through.
+    """
+    shopify.base.ShopifyConnection = RateLimitedConnection
+
+
+def _max_utilization(api):
+    with _buckets_lock:
+        buckets = [bucket for (_, kind), bucket in _buckets.items() if kind == api]
+    return max((bucket.utilization() for bucket in buckets), default=0.0)
+
+
+metrics.register_gauge('shopify.rest.bucket_utilization', lambda: _max_utilization('rest'))
+metrics.register_gauge('shopify.graphql.bucket_utilization', lambda: _max_utilization('graphql'))
@@ -0,0 +1,146 @@
+import concurrent.futures
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from api.utils import metrics
+from api.utils.cache import tiered_cache
+from api.utils.carriers import extract_tracking
+from api.utils.http import outbound_get
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+SCRAPE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Keep cache entries (and their validators) well past their freshness, so an
+# expired entry can still be revalidated with a conditional request
+TRACKING_CACHE_RETENTION = 30 * 24 * 60 * 60
+
+
+def scrape_tracking_page(url, etag=None, last_modified=None):
+    """GET a tracking page, conditionally if validators from an earlier response are given"""
+    headers = dict(SCRAPE_HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = outbound_get(url, headers=headers, timeout=10)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+
+def parse_tracking_page(url, response):
+    """Structured status, last event and ETA from a tracking page, via its carrier's extractor"""
+    html = response.text
+    return {
+        'url': url,
+        **extract_tracking(url, html),
+        'status_code': response.status_code,
+        'raw_html': html if settings.DEBUG else None  # Only include raw HTML in debug mode
+    }
+
+
+def tracking_cache_key(url):
+    return f"tracking:{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+def tracking_ttl(result):
+    """Seconds a tracking result stays fresh, by parsed status"""
+    if result['status'] == 'delivered':
+        return settings.TRACKING_DELIVERED_TTL
+    if result['status'] == 'in_transit':
+        return settings.TRACKING_IN_TRANSIT_TTL
+    return settings.TRACKING_UNKNOWN_TTL
+
+
+def error_backoff(failures):
+    """Seconds to wait before retrying a URL that has failed `failures` times in a row"""
+    return min(settings.TRACKING_ERROR_BACKOFF * 2 ** (failures - 1), settings.TRACKING_ERROR_BACKOFF_MAX)
+
+
+def fetch_tracking_status(url):
+    """
+    Fetch the status of a tracking URL, through the tracking cache.
+
+    Fresh results are served from the cache; how long a result stays fresh
+    depends on its status (delivered parcels for days, in-transit ones for
+    minutes). Expired entries are revalidated with If-None-Match /
+    If-Modified-Since, so an unchanged page costs a 304. Failures are cached
+    too, with exponential backoff, and keep serving the last good result if
+    there is one.
+    """
+    key = tracking_cache_key(url)
+    previous = tiered_cache.get(key)
+    now = time.time()
+    if previous is not None and now < previous['fresh_until']:
+        metrics.incr('tracking.cache.hits')
+        return previous['result']
+    metrics.incr('tracking.cache.misses')
+
+    # Only a successfully parsed page can be revalidated or served in place of an error
+    good = previous if previous is not None and previous['result']['status'] != 'error' else None
+    try:
+        response = scrape_tracking_page(
+            url,
+            etag=good['etag'] if good else None,
+            last_modified=good['last_modified'] if good else None,
+        )
+        if response.status_code == 304:
+            metrics.incr('tracking.not_modified')
+            result = good['result']
+        else:
+            result = parse_tracking_page(url, response)
+        entry = {
+            'result': result,
+            'etag': response.headers.get('ETag') or (good['etag'] if good else None),
+            'last_modified': response.headers.get('Last-Modified') or (good['last_modified'] if good else None),
+            'fresh_until': now + tracking_ttl(result),
+            'failures': 0,
+        }
+    except Exception as e:
+        logger.error(f"Error fetching tracking status for {url}: {str(e)}")
+        failures = (previous['failures'] if previous is not None else 0) + 1
+        entry = {
+            'result': good['result'] if good else {
+                'url': url,
+                'status': 'error',
+                'error': str(e),
+                'status_code': getattr(getattr(e, 'response', None), 'status_code', None),
+            },
+            'etag': good['etag'] if good else None,
+            'last_modified': good['last_modified'] if good else None,
+            'fresh_until': now + error_backoff(failures),
+            'failures': failures,
+        }
+
+    tiered_cache.set(key, entry, timeout=TRACKING_CACHE_RETENTION)
+    return entry['result']
+
+
+def tracking_executor():
+    """
+    The process-wide pool every tracking fetch runs on.
+
+    Its size (TRACKING_FETCH_WORKERS) caps concurrent carrier scrapes in
+    this process. Created on first use so gunicorn workers don't inherit
+    threads from the master across fork.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=settings.TRACKING_FETCH_WORKERS,
+                thread_name_prefix='tracking',
+            )
+            metrics.register_gauge('tracking.queued', lambda: _executor._work_queue.qsize())
+        return _executor
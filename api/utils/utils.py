@@ -5,9 +5,10 @@ import logging
 from functools import wraps
 from django.conf import settings
 from django.http import JsonResponse
-from discord_webhook import DiscordWebhook
 from discord_webhook import DiscordEmbed
 
+from api.utils.notifications import queue_notification
+
 logger = logging.getLogger(__name__)
 
 def custom_exception_handler(exc, context):
@@ -59,10 +60,18 @@ def send_discord_webhook(
     author_name=None,
     author_url=None,
     author_icon=None,
-    timestamp=True
+    timestamp=True,
+    digest=False
 ):
     """
-    Send a Discord webhook with rich formatting options.
+    Queue a Discord webhook with rich formatting options.
+
+    The message is written to the notification outbox (in the caller's
+    transaction, if any) and delivered in the background with retries; see
+    api.utils.notifications. Returns the Notification row.
+
+    With digest=True the message waits for the next digest (see
+    DISCORD_DIGEST_INTERVAL) and goes out together with the others in it.
     
     Args:
         message (str, optional): Simple message content
@@ -80,15 +89,10 @@ def send_discord_webhook(
         author_url (str, optional): Author URL
         author_icon (str, optional): URL for author icon
         timestamp (bool, optional): Whether to include timestamp
+        digest (bool, optional): Hold the message for the next digest
     """
-    webhook = DiscordWebhook(
-        url=settings.DISCORD_WEBHOOK_URL,
-        # username=username,
-        # avatar_url=avatar_url,
-        content=message
-    )
-
-    logger.info(f"Sending Discord webhook with message: {message}")
+    # username and avatar_url are not sent; the webhook's own are used
+    payload = {'content': message, 'embeds': []}
 
     # Create embed if any embed-specific parameters are provided
     if any([title, description, fields, color, thumbnail_url, image_url,
@@ -133,13 +137,7 @@ def send_discord_webhook(
         if timestamp:
             embed.set_timestamp()
 
-        webhook.add_embed(embed)
+        payload['embeds'].append(vars(embed))
 
-    try:
-        logger.info(f"Sending Discord webhook with message: {message}")
-        response = webhook.execute()
-        logger.info(f"Discord webhook sent successfully: {response}")
-        return response
-    except Exception as e:
-        logger.error(f"Failed to send Discord webhook: {str(e)}")
-        raise
\ No newline at end of file
+    logger.info(f"Queueing Discord webhook with message: {message}")
+    return queue_notification(payload, digest=digest)
\ No newline at end of file
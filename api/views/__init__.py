@@ -1,9 +1,11 @@
 from .product_idea import ProductIdeaViewSet
 from .issue import IssueViewSet
 from .store import StoreViewSet
+from .metrics import MetricsViewSet
 
 __all__ = [
     'ProductIdeaViewSet', 
     'IssueViewSet',
-    'StoreViewSet'
+    'StoreViewSet',
+    'MetricsViewSet'
 ] 
\ No newline at end of file
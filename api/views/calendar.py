@@ -8,7 +8,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import redirect
 from ..models.google_calendar import GoogleCalendarCredentials
-from ..utils.google_calendar import GoogleCalendarService
+from ..utils.google_calendar import GoogleCalendarService, fetch_calendars
 from datetime import datetime, timedelta
 from django.utils import timezone
 import json
@@ -16,8 +16,17 @@ from googleapiclient.discovery import build
 from django.contrib.auth.models import User
 from django.conf import settings
 from ..serializers.calendar import BookMeetingSerializer
+from ..utils.cache import tiered_cache
 import logging
 
+# Bumping this key's generation invalidates every cached calendar response
+CALENDAR_CACHE_VERSION_KEY = 'calendar_events'
+
+def calendar_cache_key(*parts):
+    """Build a cache key that changes whenever calendar events are modified through the API"""
+    version = tiered_cache.generation(CALENDAR_CACHE_VERSION_KEY)
+    return ':'.join(['calendar', f'v{version}'] + [str(part) for part in parts])
+
 class CalendarViewSet(viewsets.ViewSet):
     """
     ViewSet for handling all calendar-related operations
@@ -187,15 +196,21 @@ class CalendarViewSet(viewsets.ViewSet):
                     is_primary=True
                 )
             
-            service = GoogleCalendarService.build_service(calendar_creds.credentials)
             days = int(request.query_params.get('days', 7))
-            events = GoogleCalendarService.get_availability(service, calendar_creds.calendar_id, days)
+            cache_key = calendar_cache_key('availability', calendar_creds.id, days)
+            result = tiered_cache.get(cache_key)
             
-            return Response({
-                'email': calendar_creds.email,
-                'is_primary': calendar_creds.is_primary,
-                'events': events
-            })
+            if result is None:
+                service = GoogleCalendarService.build_service(calendar_creds.credentials)
+                events = GoogleCalendarService.get_availability(service, calendar_creds.calendar_id, days)
+                result = {
+                    'email': calendar_creds.email,
+                    'is_primary': calendar_creds.is_primary,
+                    'events': events
+                }
+                tiered_cache.set(cache_key, result, timeout=settings.CALENDAR_CACHE_TTL)
+            
+            return Response(result)
         except GoogleCalendarCredentials.DoesNotExist:
             return Response(
                 {'error': 'Calendar not found'},
@@ -240,6 +255,9 @@ class CalendarViewSet(viewsets.ViewSet):
                 validated_data.get('attendees', [])
             )
             
+            # Cached availability no longer reflects the new event
+            tiered_cache.delete(CALENDAR_CACHE_VERSION_KEY)
+            
             return Response({
                 'message': 'Event created successfully',
                 'event': event,
@@ -263,8 +281,13 @@ class CalendarViewSet(viewsets.ViewSet):
         logger = logging.getLogger('api')
         days = int(request.query_params.get('days', 7))
         
-        calendars = GoogleCalendarCredentials.objects.select_related('user').all()
-        logger.info(f"Found {calendars.count()} total calendars in the system")
+        cache_key = calendar_cache_key('all_availability', days)
+        cached = tiered_cache.get(cache_key)
+        if cached is not None:
+            return Response(cached)
+        
+        calendars = list(GoogleCalendarCredentials.objects.all())
+        logger.info(f"Found {len(calendars)} total calendars in the system")
         
         # Get current time rounded to the next hour
         now = timezone.now()
@@ -284,37 +307,37 @@ class CalendarViewSet(viewsets.ViewSet):
                 slot_end = slot_start + timedelta(hours=1)
                 time_slots.append((slot_start, slot_end))
         
+        def fetch(cal):
+            logger.info(f"Processing calendar: {cal.email} (ID: {cal.id})")
+            service = GoogleCalendarService.build_service(
+                cal.get_credentials(), timeout=settings.CALENDAR_REQUEST_TIMEOUT)
+            return GoogleCalendarService.get_availability(service, cal.calendar_id, days)
+
         # Collect all busy periods
         busy_periods = []
-        for cal in calendars:
-            try:
-                logger.info(f"Processing calendar: {cal.email} (ID: {cal.id})")
-                
-                creds_dict = cal.get_credentials()
-                service = GoogleCalendarService.build_service(creds_dict)
-                
-                events = GoogleCalendarService.get_availability(
-                    service, 
-                    cal.calendar_id, 
-                    days
-                )
-                
-                for event in events:
-                    start = datetime.fromisoformat(event['start'].replace('Z', '+00:00'))
-                    if start.tzinfo is None:
-                        start = timezone.make_aware(start)
-                        
-                    end = datetime.fromisoformat(event['end'].replace('Z', '+00:00'))
-                    if end.tzinfo is None:
-                        end = timezone.make_aware(end)
-                        
-                    busy_periods.append((start, end))
-                
-                logger.info(f"Added {len(events)} events from {cal.email}")
-                
-            except Exception as e:
-                logger.error(f"Error getting availability for calendar {cal.email}: {str(e)}")
-                logger.exception(e)
+        calendar_errors = []
+        for cal, events, error in fetch_calendars(calendars, fetch):
+            if error:
+                logger.error(f"Error getting availability for calendar {cal.email}: {error}")
+                calendar_errors.append({
+                    'email': cal.email,
+                    'calendar_id': cal.calendar_id,
+                    'error': f"Failed to process calendar: {error}"
+                })
+                continue
+
+            for event in events:
+                start = datetime.fromisoformat(event['start'].replace('Z', '+00:00'))
+                if start.tzinfo is None:
+                    start = timezone.make_aware(start)
+
+                end = datetime.fromisoformat(event['end'].replace('Z', '+00:00'))
+                if end.tzinfo is None:
+                    end = timezone.make_aware(end)
+
+                busy_periods.append((start, end))
+
+            logger.info(f"Added {len(events)} events from {cal.email}")
         
         # Find available slots
         available_slots = []
@@ -334,12 +357,17 @@ class CalendarViewSet(viewsets.ViewSet):
                     'duration_minutes': 60
                 })
         
-        return Response({
+        result = {
             'available_slots': available_slots,
             'total_slots': len(available_slots),
             'calendars_processed': len(calendars),
+            'calendar_errors': calendar_errors,
             'time_zone': str(timezone.get_current_timezone())
-        })
+        }
+        # Slots a failed calendar may be busy in are listed as free; don't keep that around
+        if not calendar_errors:
+            tiered_cache.set(cache_key, result, timeout=settings.CALENDAR_CACHE_TTL)
+        return Response(result)
 
     @action(detail=False, methods=['get'], url_path='events')
     @admin_required
@@ -348,44 +376,35 @@ class CalendarViewSet(viewsets.ViewSet):
         logger = logging.getLogger('api')
         
         days = int(request.query_params.get('days', 7))
+        calendars = list(GoogleCalendarCredentials.objects.select_related('user'))
+
+        def fetch(creds):
+            # Log the raw credentials for debugging
+            logger.debug(f"Raw credentials for {creds.email}: {creds.credentials}")
+
+            # Get and validate credentials
+            credentials = creds.get_credentials()
+            if not credentials:
+                raise ValueError("No valid credentials found")
+
+            service = GoogleCalendarService.build_service(
+                credentials, timeout=settings.CALENDAR_REQUEST_TIMEOUT)
+            return GoogleCalendarService.get_events(service, creds.calendar_id, days)
+
         events_list = []
-        calendars = GoogleCalendarCredentials.objects.all()
-        
-        for creds in calendars:
-            try:
-                # Log the raw credentials for debugging
-                logger.debug(f"Raw credentials for {creds.email}: {creds.credentials}")
-                
-                # Get and validate credentials
-                credentials = creds.get_credentials()
-                if not credentials:
-                    raise ValueError("No valid credentials found")
-                
-                service = GoogleCalendarService.build_service(credentials)
-                
-                events = GoogleCalendarService.get_events(
-                    service, 
-                    creds.calendar_id, 
-                    days
-                )
-                
-                events_list.append({
-                    'email': creds.email,
-                    'is_primary': creds.is_primary,
-                    'events': events,
-                    'calendar_id': creds.calendar_id,
-                    'user': creds.user.username
-                })
-                
-            except Exception as e:
-                logger.error(f"Error processing calendar {creds.email}: {str(e)}")
-                events_list.append({
-                    'email': creds.email,
-                    'is_primary': creds.is_primary,
-                    'error': f"Failed to process calendar: {str(e)}",
-                    'calendar_id': creds.calendar_id,
-                    'user': creds.user.username
-                })
+        for creds, events, error in fetch_calendars(calendars, fetch):
+            entry = {
+                'email': creds.email,
+                'is_primary': creds.is_primary,
+                'calendar_id': creds.calendar_id,
+                'user': creds.user.username
+            }
+            if error:
+                logger.error(f"Error processing calendar {creds.email}: {error}")
+                entry['error'] = f"Failed to process calendar: {error}"
+            else:
+                entry['events'] = events
+            events_list.append(entry)
 
         return Response({
             'calendars_found': len(calendars),
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import viewsets
 from rest_framework.response import Response
 from ..models import Issue
@@ -16,13 +18,15 @@ class IssueViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        # Save the issue
-        issue = serializer.save()
-        
-        logger.info("New issue created with severity: %s", issue.severity)
-        
-        # Send Discord notification
-        try:
+        # The notification is written to the outbox in the same transaction, so it
+        # exists exactly when the issue does
+        with transaction.atomic():
+            # Save the issue
+            issue = serializer.save()
+
+            logger.info("New issue created with severity: %s", issue.severity)
+
+            # Queue the Discord notification
             # Get severity emoji
             severity_emoji = {
                 'LOW': '🟢',
@@ -82,10 +86,8 @@ class IssueViewSet(viewsets.ModelViewSet):
                 color=color,
                 username="Issue Tracker",
                 footer_text="Issue Management System",
-                timestamp=True
+                timestamp=True,
+                # Less urgent issues are summarized periodically instead of posted one by one
+                digest=issue.severity in settings.DISCORD_DIGEST_SEVERITIES
             )
-            logger.info("Discord notification sent for new issue")
-            
-        except Exception as webhook_error:
-            logger.error("Failed to send Discord notification for new issue: %s", str(webhook_error))
-            # Continue execution even if webhook fails 
\ No newline at end of file
+            logger.info("Discord notification queued for new issue")
\ No newline at end of file
@@ -0,0 +1,15 @@
+from rest_framework import viewsets
+from rest_framework.response import Response
+from api.utils.utils import admin_required
+from api.utils import metrics
+import os
+
+class MetricsViewSet(viewsets.ViewSet):
+    """Per-process counters, gauges and summaries (one gunicorn worker per response)"""
+
+    @admin_required
+    def list(self, request):
+        return Response({
+            'pid': os.getpid(),
+            **metrics.snapshot()
+        })
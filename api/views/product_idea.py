@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import viewsets
 from rest_framework.response import Response
 
@@ -18,13 +19,15 @@ class ProductIdeaViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        # Save the product idea
-        product_idea = serializer.save()
-        
-        logger.info("New product idea created: %s", product_idea.title)
-        
-        # Send Discord notification
-        try:
+        # The notification is written to the outbox in the same transaction, so it
+        # exists exactly when the product idea does
+        with transaction.atomic():
+            # Save the product idea
+            product_idea = serializer.save()
+
+            logger.info("New product idea created: %s", product_idea.title)
+
+            # Queue the Discord notification
             fields = [
                 {
                     "name": "💡 Title",
@@ -54,8 +57,4 @@ class ProductIdeaViewSet(viewsets.ModelViewSet):
                 footer_text="Product Ideas Manager",
                 timestamp=True
             )
-            logger.info("Discord notification sent for new product idea")
-            
-        except Exception as webhook_error:
-            logger.error("Failed to send Discord notification for new product idea: %s", str(webhook_error))
-            # Continue execution even if webhook fails 
\ No newline at end of file
+            logger.info("Discord notification queued for new product idea")
\ No newline at end of file
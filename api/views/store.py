@@ -1,19 +1,31 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from django.conf import settings
-from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 import shopify
 from rest_framework.exceptions import ValidationError
 import logging
 import traceback
 import sys
-import requests
-from bs4 import BeautifulSoup
-import concurrent.futures
+import hashlib
+import base64
+import json
+from urllib.parse import parse_qs, urlparse
 
-from api.utils.utils import send_discord_webhook
-from api.utils.shopify import init_shopify
+from api.utils.shopify import fetch_page, init_shopify
+from api.utils.catalog import (
+    CatalogSnapshot, CatalogSync, PRODUCT_FIELDS, decode_cursor, encode_cursor
+)
+from api.utils.cache import StaleWhileRevalidate, tiered_cache
+from api.utils.inventory import report_inventory_changes
+from api.utils.mirror import mirror_is_populated, mirrored_catalog
+from api.utils.orders import (
+    contact_matches, index_orders, indexed_order, normalize_order_number, normalize_phone, phone_order_ids
+)
+from api.utils.shipments import order_shipments, serialize_shipment, shipment_status, stored_shipment
+from api.renderers import NDJSONRenderer, ndjson_line
 from api.utils.auth import allow_demo_key
 from api.permissions import HasValidAPIKey
 
@@ -37,31 +49,293 @@ def format_exception():
         'trace': trace_strings,
     }
 
-def fetch_tracking_status(url):
-    """Fetch the content from a tracking URL"""
+def customer_cache_key(prefix, *parts):
+    """Build a cache key for customer lookups without storing contact details in it"""
+    digest = hashlib.sha256('|'.join((part or '').lower() for part in parts).encode()).hexdigest()
+    return f"{prefix}:{digest}"
+
+def load_catalog():
+    """Return the product list from the local mirror, or from Shopify until the mirror is backfilled"""
+    if settings.STORE_CATALOG_SOURCE == 'mirror' and mirror_is_populated():
+        logger.info("🗄️ Loading catalog from the product mirror")
+        return mirrored_catalog()
+
+    logger.info("🔄 Syncing catalog with Shopify")
+    init_shopify()
+    return CatalogSync().sync()
+
+CUSTOMER_ORDER_FIELDS = ','.join((
+    'id', 'name', 'email', 'phone', 'created_at', 'financial_status',
+    'fulfillment_status', 'line_items', 'total_price', 'fulfillments',
+))
+
+def page_info_from(next_url):
+    return parse_qs(urlparse(next_url).query)['page_info'][0] if next_url else None
+
+def fetch_customer_orders_page(email, cursor, limit):
+    """Return (orders, next_cursor) for one page of Shopify orders, newest first"""
+    if cursor:
+        # page_info cursors carry the original filters; Shopify rejects them alongside
+        params = {'page_info': cursor}
+    else:
+        params = {'status': 'any', 'order': 'created_at desc'}
+        if email:
+            params['email'] = email
+    orders, next_url = fetch_page('orders', limit=limit, fields=CUSTOMER_ORDER_FIELDS, **params)
+    return orders, page_info_from(next_url)
+
+def phone_search_query(digits):
+    """Shopify customer search for a phone number, with or without its country code"""
+    candidates = {digits, f"+{digits}"}
+    if len(digits) == 10:
+        # A national (NANP) number; Shopify stores phones in E.164
+        candidates.add(f"+1{digits}")
+    return ' OR '.join(f"phone:{candidate}" for candidate in sorted(candidates))
+
+def customer_ids_for_phone(digits):
+    """
+    Return the ids of Shopify customers whose phone ends with digits.
+
+    The mapping is cached for STORE_PHONE_CUSTOMER_TTL (ORDERS_CACHE_TTL when
+    nobody matches, so new customers show up quickly).
+    """
+    cache_key = customer_cache_key('store_phone_customers', digits)
+    customer_ids = tiered_cache.get(cache_key)
+    if customer_ids is None:
+        customers, _ = fetch_page('customers/search', key='customers', limit=250, fields='id,phone',
+                                  query=phone_search_query(digits))
+        customer_ids = [customer['id'] for customer in customers
+                        if normalize_phone(customer.get('phone')).endswith(digits)]
+        tiered_cache.set(cache_key, customer_ids, timeout=(
+            settings.STORE_PHONE_CUSTOMER_TTL if customer_ids else settings.ORDERS_CACHE_TTL))
+    return customer_ids
+
+def encode_phone_cursor(source, position):
+    """Cursor for the next phone page: ('index', last order id) or (customer index, page_info)"""
+    return base64.urlsafe_b64encode(json.dumps([source, position]).encode()).decode().rstrip('=')
+
+def decode_phone_cursor(cursor):
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # Get the page content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        return {
-            'url': url,
-            'status_code': response.status_code,
-            'content': soup.get_text()[:1000],  # First 1000 chars of text content
-            'raw_html': response.text if settings.DEBUG else None  # Only include raw HTML in debug mode
-        }
+        padded = cursor + '=' * (-len(cursor) % 4)
+        source, position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if source == 'index':
+            return source, int(position)
+        return int(source), position
+    except (TypeError, ValueError, base64.binascii.Error):
+        raise ValidationError("Invalid cursor")
+
+def fetch_indexed_phone_orders_page(digits, before_id, limit):
+    """Return (orders, next_cursor) for one page of the indexed orders whose phone ends with digits"""
+    order_ids = phone_order_ids(digits, limit + 1, before_id)
+    more = len(order_ids) > limit
+    order_ids = order_ids[:limit]
+    if not order_ids:
+        return [], None
+    orders, _ = fetch_page('orders', ids=','.join(map(str, order_ids)), status='any',
+                           limit=len(order_ids), fields=CUSTOMER_ORDER_FIELDS)
+    return orders, encode_phone_cursor('index', order_ids[-1]) if more else None
+
+def fetch_phone_orders_page(phone, cursor, limit):
+    """
+    Return (orders, next_cursor) for one page of the orders placed with this phone.
+
+    Orders are matched on their own phone (ending with the given digits) in
+    the order index, then fetched from Shopify. If the index has none (e.g.
+    orders not backfilled yet), Shopify does the matching instead: a
+    customer search by phone, then each matching customer's orders (newest
+    first) in turn. That only finds customers whose profile phone is the
+    full number, so guest checkouts are missed. The cursor records which
+    source, and where in it, comes next.
+    """
+    digits = normalize_phone(phone)
+    if not digits:
+        raise ValidationError("Phone number must contain digits")
+    source, position = decode_phone_cursor(cursor) if cursor else (None, None)
+    if source == 'index':
+        return fetch_indexed_phone_orders_page(digits, position, limit)
+    if source is None:
+        orders, next_cursor = fetch_indexed_phone_orders_page(digits, None, limit)
+        if orders or next_cursor:
+            return orders, next_cursor
+        source = 0
+
+    customer_index, page_info = source, position
+    customer_ids = customer_ids_for_phone(digits)
+    if customer_index >= len(customer_ids):
+        return [], None
+
+    params = {'page_info': page_info} if page_info else {'status': 'any'}
+    orders, next_url = fetch_page(f"customers/{customer_ids[customer_index]}/orders", key='orders',
+                                  limit=limit, fields=CUSTOMER_ORDER_FIELDS, **params)
+    if next_url:
+        next_cursor = encode_phone_cursor(customer_index, page_info_from(next_url))
+    elif customer_index + 1 < len(customer_ids):
+        next_cursor = encode_phone_cursor(customer_index + 1, None)
+    else:
+        next_cursor = None
+    return orders, next_cursor
+
+def customer_order_matches(order, email, phone):
+    order_phone = normalize_phone(order.get("phone"))
+    query_phone = normalize_phone(phone)
+    return bool(
+        (email and order.get("email") and order["email"].lower() == email.lower()) or
+        (phone and order_phone and order_phone.endswith(query_phone))
+    )
+
+def customer_order_data(order, shipments=()):
+    """
+    The orders endpoint's view of a Shopify REST order dict, with the stored status of its shipments.
+
+    tracking_numbers, tracking_urls and tracking_status all come from the
+    shipments, so they line up: the nth URL (None if there is none) and
+    status belong to the nth tracking number.
+    """
+    tracking_status = [shipment_status(shipment) for shipment in shipments]
+
+    return {
+        "order_number": order["name"],
+        "created_at": order["created_at"],
+        "status": order["financial_status"],
+        "fulfillment_status": order["fulfillment_status"],
+        "total_items": sum(item["quantity"] for item in order["line_items"]),
+        "total_price": str(order["total_price"]),
+        "tracking_numbers": [status["tracking_number"] for status in tracking_status],
+        "tracking_urls": [status["url"] for status in tracking_status],
+        "tracking_status": tracking_status,
+    }
+
+def orders_stream_response(orders, next_cursor):
+    """Stream orders as NDJSON, one order per line"""
+    response = StreamingHttpResponse((ndjson_line(order) for order in orders),
+                                     content_type=NDJSONRenderer.media_type)
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
+
+def refresh_catalog():
+    """Reload the served catalog and report stock level changes to Discord"""
+    product_list = load_catalog()
+    try:
+        report_inventory_changes(product_list)
     except Exception as e:
-        logger.error(f"Error fetching tracking status for {url}: {str(e)}")
-        return {
-            'url': url,
-            'error': str(e),
-            'status_code': getattr(response, 'status_code', None) if 'response' in locals() else None
-        }
+        # The refreshed catalog is still good to serve
+        logger.error(f"Error reporting inventory changes: {str(e)}")
+    return CatalogSnapshot(product_list)
+
+
+def catalog_response(request, snapshot, source):
+    """Serve a pre-rendered catalog body, or 304 if the client already has it"""
+    cache_headers = {
+        'ETag': snapshot.etag,
+        'Cache-Control': f'private, max-age={settings.STORE_CATALOG_MAX_AGE}',
+        'Vary': 'Accept-Encoding',
+    }
+    if snapshot.matches(request.headers.get('If-None-Match')):
+        return HttpResponseNotModified(headers=cache_headers)
+
+    encoding = snapshot.negotiate_encoding(request.headers.get('Accept-Encoding'))
+    response = HttpResponse(snapshot.body(source, encoding), content_type='application/json',
+                            headers=cache_headers)
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    return response
+
+def parse_limit(value, default, maximum):
+    """Parse a limit query parameter; raises ValidationError"""
+    if not value:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValidationError("limit must be an integer")
+    if not 1 <= limit <= maximum:
+        raise ValidationError(f"limit must be between 1 and {maximum}")
+    return limit
+
+CATALOG_QUERY_PARAMS = ('product_type', 'vendor', 'tag', 'in_stock', 'handle', 'cursor', 'limit', 'fields')
+
+def filtered_catalog_response(request, snapshot, source):
+    """Filter, paginate and project the catalog using the snapshot's indexes"""
+    params = request.query_params
+
+    filters = {
+        field: params[field]
+        for field in ('product_type', 'vendor', 'tag', 'handle')
+        if params.get(field)
+    }
+    if params.get('in_stock'):
+        in_stock = params['in_stock'].lower()
+        if in_stock not in ('true', 'false', '1', '0'):
+            raise ValidationError("in_stock must be true or false")
+        filters['in_stock'] = in_stock in ('true', '1')
+
+    limit = parse_limit(params.get('limit'), None, 250)
+
+    after_id = None
+    if params.get('cursor'):
+        try:
+            after_id = decode_cursor(params['cursor'])
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    fields = None
+    if params.get('fields'):
+        fields = [field.strip() for field in params['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in PRODUCT_FIELDS]
+        if unknown:
+            raise ValidationError(f"Unknown fields: {', '.join(unknown)}")
+
+    positions, total, next_after_id = snapshot.index.query(filters, after_id=after_id, limit=limit)
+    products = [snapshot.products[position] for position in positions]
+    if fields:
+        products = [{field: product[field] for field in fields} for product in products]
+
+    return Response({
+        "products": products,
+        "count": total,
+        "next_cursor": encode_cursor(next_after_id) if next_after_id is not None else None,
+        "source": source,
+    })
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+STOCK_LOOKUP_LIMIT = 250
+
+def stock_entry(product, variant):
+    return {
+        "variant_id": variant["id"],
+        "sku": variant["sku"],
+        "product_id": product["id"],
+        "inventory_quantity": variant["inventory_quantity"],
+        "in_stock": variant["in_stock"],
+    }
+
+def parse_stock_request(data):
+    """Return (skus, variant_ids) from a stock lookup body; raises ValidationError"""
+    skus = data.get('skus') or []
+    variant_ids = data.get('variant_ids') or []
+    if not isinstance(skus, list) or not isinstance(variant_ids, list):
+        raise ValidationError("skus and variant_ids must be lists")
+    if not skus and not variant_ids:
+        raise ValidationError("Either skus or variant_ids must be provided")
+    if len(skus) + len(variant_ids) > STOCK_LOOKUP_LIMIT:
+        raise ValidationError(f"At most {STOCK_LOOKUP_LIMIT} skus and variant_ids can be looked up at once")
+
+    try:
+        variant_ids = [int(variant_id) for variant_id in variant_ids]
+    except (TypeError, ValueError):
+        raise ValidationError("variant_ids must be integers")
+    return [str(sku) for sku in skus], variant_ids
+
+catalog_cache = StaleWhileRevalidate(
+    'shopify_products',
+    refresh_catalog,
+    soft_ttl=settings.STORE_CATALOG_SOFT_TTL,
+    hard_ttl=settings.STORE_CATALOG_HARD_TTL,
+    source=settings.STORE_CATALOG_SOURCE,
+)
 
 class StoreViewSet(viewsets.ViewSet):
     permission_classes = [HasValidAPIKey]
@@ -69,7 +343,13 @@ class StoreViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'], url_path='products')
     def products(self, request):
-        """List all products"""
+        """
+        List all products.
+
+        Optional query parameters: product_type, vendor, tag, handle, in_stock
+        (true/false), limit (1-250) with cursor (next_cursor from the previous
+        page), and fields (comma-separated product keys to return).
+        """
         return self.get_products(request)
 
     def get_products(self, request):
@@ -77,151 +357,19 @@ class StoreViewSet(viewsets.ViewSet):
         try:
             logger.info("🚀 STARTING NEW PRODUCT FETCH REQUEST 🚀")
             
-            # Initialize Shopify API first
-            init_shopify()
-            
-            cache_key = 'shopify_products'
-            cached_products = cache.get(cache_key)
+            snapshot, source = catalog_cache.get()
             
-            if cached_products:
-                logger.info("💾 CACHE HIT - Returning %d products", len(cached_products))
-                return Response({"products": cached_products, "source": "cache"})
-            
-            logger.info("🔄 CACHE MISS - Fetching fresh data from Shopify")
-            products = shopify.Product.find(status='active')
-            product_list = []
-            
-            total_products = len(products)
-            total_variants = 0
-            out_of_stock_products = 0
-            low_stock_products = []
-
-            logger.info("📦 Processing %d products from Shopify", total_products)
-
-            for product in products:
-                variants = []
-                for variant in product.variants:
-                    inventory_qty = variant.inventory_quantity
-                    variants.append({
-                        "id": variant.id,
-                        "title": variant.title,
-                        "sku": variant.sku,
-                        "price": variant.price,
-                        "compare_at_price": variant.compare_at_price,
-                        "in_stock": inventory_qty > 0,
-                        "inventory_quantity": inventory_qty,
-                        "requires_shipping": variant.requires_shipping
-                    })
-                    
-                    if inventory_qty == 0:
-                        logger.debug("❌ Variant '%s' of '%s' is out of stock", 
-                                   variant.title, product.title)
-                    elif inventory_qty <= 5:
-                        logger.debug("⚠️ Variant '%s' of '%s' has low stock (%d units)", 
-                                   variant.title, product.title, inventory_qty)
-
-                product_has_stock = any(v["in_stock"] for v in variants)
-                if not product_has_stock:
-                    out_of_stock_products += 1
-                    logger.info("🚫 Product '%s' is completely out of stock", product.title)
-                elif any(0 < v["inventory_quantity"] <= 5 for v in variants):
-                    low_stock_products.append(product.title)
-                    logger.info("📉 Product '%s' has low stock variants", product.title)
-                
-                total_variants += len(variants)
-                
-                product_list.append({
-                    "id": product.id,
-                    "title": product.title,
-                    "description": product.body_html,
-                    "vendor": product.vendor,
-                    "product_type": product.product_type,
-                    "tags": product.tags.split(',') if product.tags else [],
-                    "handle": product.handle,
-                    "published_at": product.published_at,
-                    "variants": variants,
-                    "has_stock": product_has_stock,
-                    "url": f"https://utility.materials.nyc/products/{product.handle}"
-                })
-
-            logger.info(
-                "📊 INVENTORY SUMMARY:\n"
-                "- Total Products: %d\n"
-                "- Total Variants: %d\n"
-                "- Out of Stock: %d\n"
-                "- Low Stock: %d",
-                total_products, total_variants, out_of_stock_products, len(low_stock_products)
-            )
-
-            if low_stock_products:
-                logger.info("📋 Low stock products:\n%s", 
-                           "\n".join(f"- {product}" for product in low_stock_products))
-
-            # Store in cache for 5 minutes
-            cache.set(cache_key, product_list, timeout=300)
-            logger.info("💾 Products cached successfully (expires in 5 minutes)")
-
-
-            logger.info("📨 Sending inventory update to Discord")
-            
-            # Format low stock products list (limited to 5 for readability)
-            low_stock_field = {
-                "name": "📉 Low Stock Products",
-                "value": "\n".join(f"• {product}" for product in low_stock_products[:5]),
-                "inline": False
-            } if low_stock_products else None
-
-            fields = [
-                {
-                    "name": "📦 Total Products",
-                    "value": str(total_products),
-                    "inline": True
-                },
-                {
-                    "name": "🔢 Total Variants",
-                    "value": str(total_variants),
-                    "inline": True
-                },
-                {
-                    "name": "❌ Out of Stock",
-                    "value": f"{out_of_stock_products} products",
-                    "inline": True
-                },
-                {
-                    "name": "⚠️ Low Stock",
-                    "value": f"{len(low_stock_products)} products",
-                    "inline": True
-                },
-                {
-                    "name": "💾 Cache Status",
-                    "value": "✅ Updated (5min)",
-                    "inline": True
-                }
-            ]
-
-            # Add low stock field if there are any
-            if low_stock_field:
-                fields.append(low_stock_field)
-
-            # Add note if there are more low stock products
-            if len(low_stock_products) > 5:
-                fields.append({
-                    "name": "📝 Note",
-                    "value": f"_{len(low_stock_products) - 5} more products have low stock_",
-                    "inline": False
-                })
-
-            send_discord_webhook(
-                title="⚙️ utility.materials.nyc Inventory Update",
-                description="Latest product catalog refresh completed",
-                fields=fields,
-                color="ff5f05",  # Orange color
-                timestamp=True
-            )
-            logger.info("✅ Discord notification sent successfully")
-        
-            return Response({"products": product_list, "source": "shopify"})
+            if source == 'stale':
+                logger.info("⏳ STALE HIT - Returning %d products while refreshing", len(snapshot))
+            elif source == 'cache':
+                logger.info("💾 CACHE HIT - Returning %d products", len(snapshot))
+
+            if any(param in request.query_params for param in CATALOG_QUERY_PARAMS):
+                return filtered_catalog_response(request, snapshot, source)
+            return catalog_response(request, snapshot, source)
             
+        except ValidationError as e:
+            return Response({"error": str(e)}, status=400)
         except Exception as e:
             error_details = format_exception()
             logger.error("❌ Error fetching products: %s", error_details)
@@ -230,6 +378,84 @@ class StoreViewSet(viewsets.ViewSet):
                 return Response(error_details, status=500)
             return Response({"error": str(e)}, status=500)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Search products by title, tags, vendor, product type and description.
+
+        Query parameters: q (words or word prefixes, all of which must match)
+        and limit (1-100, default 20). Results are ranked best match first.
+        """
+        try:
+            query = request.query_params.get('q', '').strip()
+            if not query:
+                raise ValidationError("q must be provided")
+            limit = parse_limit(request.query_params.get('limit'), SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT)
+
+            snapshot, source = catalog_cache.get()
+            positions, total = snapshot.search_index.search(query, limit=limit)
+
+            return Response({
+                "query": query,
+                "products": [snapshot.products[position] for position in positions],
+                "count": total,
+                "source": source,
+            })
+
+        except ValidationError as e:
+            return Response({"error": str(e)}, status=400)
+        except Exception as e:
+            error_details = format_exception()
+            logger.error("❌ Error searching products: %s", error_details)
+
+            if settings.DEBUG:
+                return Response(error_details, status=500)
+            return Response({"error": str(e)}, status=500)
+
+    @action(detail=False, methods=['post'])
+    def stock(self, request):
+        """
+        Look up stock for a batch of variants.
+
+        Body: {"skus": [...], "variant_ids": [...]} (either or both, up to 250
+        in total). Unknown SKUs and ids are listed under "not_found".
+        """
+        try:
+            skus, variant_ids = parse_stock_request(request.data)
+            snapshot, source = catalog_cache.get()
+            index = snapshot.index
+
+            stock = []
+            not_found = {"skus": [], "variant_ids": []}
+            for variant_id in variant_ids:
+                match = index.variant(variant_id=variant_id)
+                if match:
+                    stock.append(stock_entry(*match))
+                else:
+                    not_found["variant_ids"].append(variant_id)
+            for sku in skus:
+                match = index.variant(sku=sku)
+                if match:
+                    stock.append(stock_entry(*match))
+                else:
+                    not_found["skus"].append(sku)
+
+            return Response({
+                "stock": stock,
+                "not_found": not_found,
+                "source": source,
+            })
+
+        except ValidationError as e:
+            return Response({"error": str(e)}, status=400)
+        except Exception as e:
+            error_details = format_exception()
+            logger.error("❌ Error looking up stock: %s", error_details)
+
+            if settings.DEBUG:
+                return Response(error_details, status=500)
+            return Response({"error": str(e)}, status=500)
+
     @action(detail=False, methods=['get'], url_path='orders/(?P<order_number>[^/.]+)')
     def lookup_order(self, request, order_number=None):
         """Look up a specific order by number"""
@@ -241,47 +467,27 @@ class StoreViewSet(viewsets.ViewSet):
 
         try:
             # Remove '#' from order number if present
-            order_number = order_number.replace('#', '')
-            
-            init_shopify()
-            orders = shopify.Order.find(
-                name=f"#{order_number}",
-                status="any"
-            )
+            order_number = normalize_order_number(order_number)
             
-            # Find the order that matches either email or phone
-            matching_order = None
-            for order in orders:
-                order_phone = ''.join(filter(str.isdigit, order.phone or ''))
-                query_phone = ''.join(filter(str.isdigit, phone or ''))
-                
-                if (email and order.email and order.email.lower() == email.lower()) or \
-                   (phone and order_phone and order_phone.endswith(query_phone)):
-                    matching_order = order
-                    break
+            order = indexed_order(order_number)
+            missing_key = f"store_order_missing:{order_number}"
+            if order is None and not tiered_cache.get(missing_key):
+                # Not indexed yet (e.g. a webhook still in flight): ask Shopify and index what it returns
+                init_shopify()
+                index_orders([found.to_dict() for found in shopify.Order.find(
+                    name=f"#{order_number}",
+                    status="any"
+                )])
+                order = indexed_order(order_number)
+                if order is None:
+                    tiered_cache.set(missing_key, True, timeout=settings.ORDERS_CACHE_TTL)
             
-            if not matching_order:
+            if order is None or not contact_matches(order, email=email, phone=phone):
                 return Response(
                     {"error": "No order found matching this order number and contact information"},
                     status=404
                 )
-            
-            # Format line items (without personal info)
-            line_items = []
-            for item in matching_order.line_items:
-                line_items.append({
-                    "title": item.title,
-                    "quantity": item.quantity,
-                    "variant_title": item.variant_title
-                })
-            
-            return Response({
-                "order_number": matching_order.name,
-                "created_at": matching_order.created_at,
-                "status": matching_order.financial_status,
-                "fulfillment_status": matching_order.fulfillment_status,
-                "line_items": line_items
-            })
+            return Response(order.summary)
             
         except ValidationError as e:
             return Response({"error": str(e)}, status=400)
@@ -293,9 +499,27 @@ class StoreViewSet(viewsets.ViewSet):
                 return Response(error_details, status=500)
             return Response({"error": str(e)}, status=500)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'],
+            renderer_classes=[JSONRenderer, BrowsableAPIRenderer, NDJSONRenderer])
     def orders(self, request):
-        """Get all orders for a customer"""
+        """
+        Get a customer's orders, newest first.
+
+        Query parameters: email and/or phone, limit (1-250, default 250) and
+        cursor (next_cursor from the previous page). With an email, Shopify
+        filters by email and orders matching either contact are kept, so a
+        page can hold fewer than limit orders while next_cursor is still set.
+        With only a phone, orders whose phone ends with those digits are found
+        in the order index (falling back to the orders of Shopify customers
+        with that phone when none are indexed).
+
+        tracking_status is the latest status stored by the shipment refresher
+        (manage.py refresh_shipments); shipments it has not checked yet are
+        'pending', and those without a tracking URL 'untracked'.
+
+        With `Accept: application/x-ndjson` each order is streamed as one JSON
+        line and the next cursor is sent in the X-Next-Cursor header.
+        """
         email = request.query_params.get('email')
         phone = request.query_params.get('phone')
 
@@ -303,62 +527,38 @@ class StoreViewSet(viewsets.ViewSet):
             raise ValidationError("Either email or phone number must be provided")
         
         try:
-            init_shopify()
+            limit = parse_limit(request.query_params.get('limit'), 250, 250)
+            cursor = request.query_params.get('cursor')
+            streaming = request.accepted_renderer.format == 'ndjson'
+
+            cache_key = customer_cache_key('store_orders', email, phone, cursor, str(limit))
+            cached_page = tiered_cache.get(cache_key)
+            if cached_page is not None:
+                logger.info(f"Returning {len(cached_page['orders'])} cached orders")
+                if streaming:
+                    return orders_stream_response(iter(cached_page['orders']), cached_page['next_cursor'])
+                return Response(cached_page)
             
-            query_params = {'status': 'any', 'limit': 250}
+            init_shopify()
             if email:
-                query_params['email'] = email
-            
-            orders = shopify.Order.find(**query_params)
-            
-            matching_orders = []
-            for order in orders:
-                order_phone = ''.join(filter(str.isdigit, order.phone or ''))
-                query_phone = ''.join(filter(str.isdigit, phone or ''))
-                
-                if (email and order.email and order.email.lower() == email.lower()) or \
-                   (phone and order_phone and order_phone.endswith(query_phone)):
-                    total_items = sum(item.quantity for item in order.line_items)
-                    
-                    # Get tracking numbers from fulfillments
-                    tracking_numbers = []
-                    tracking_urls = []
-                    tracking_status = []
-                    
-                    if hasattr(order, 'fulfillments'):
-                        for fulfillment in order.fulfillments:
-                            if fulfillment.tracking_number:
-                                tracking_numbers.append(fulfillment.tracking_number)
-                            if fulfillment.tracking_url:
-                                tracking_urls.append(fulfillment.tracking_url)
-                    
-                    # Fetch tracking status if requested
-                    if tracking_urls:
-                        logger.info(f"Fetching tracking status for order {order.name}")
-                        # Use ThreadPoolExecutor to fetch tracking statuses concurrently
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                            tracking_status = list(executor.map(fetch_tracking_status, tracking_urls))
-                    
-                    order_data = {
-                        "order_number": order.name,
-                        "created_at": order.created_at,
-                        "status": order.financial_status,
-                        "fulfillment_status": order.fulfillment_status,
-                        "total_items": total_items,
-                        "total_price": str(order.total_price),
-                        "tracking_numbers": tracking_numbers,
-                        "tracking_urls": tracking_urls,
-                    }
-                    
-                    if tracking_status:
-                        order_data["tracking_status"] = tracking_status
-                    
-                    matching_orders.append(order_data)
-            
+                orders, next_cursor = fetch_customer_orders_page(email, cursor, limit)
+                orders = [order for order in orders if customer_order_matches(order, email, phone)]
+            else:
+                orders, next_cursor = fetch_phone_orders_page(phone, cursor, limit)
+            shipments = order_shipments(orders)
+            matching_orders = [customer_order_data(order, shipments.get(order["id"], [])) for order in orders]
             matching_orders.sort(key=lambda x: x['created_at'], reverse=True)
-            
             logger.info(f"Found {len(matching_orders)} orders for query: email={email}, phone={phone}")
-            return Response({"orders": matching_orders})
+
+            page = {"orders": matching_orders, "next_cursor": next_cursor}
+            # Pages with shipments not checked yet are not cached, so the next request picks up their status
+            if not any(status['status'] == 'pending'
+                       for order in matching_orders for status in order['tracking_status']):
+                tiered_cache.set(cache_key, page, timeout=settings.ORDERS_CACHE_TTL)
+
+            if streaming:
+                return orders_stream_response(iter(matching_orders), next_cursor)
+            return Response(page)
             
         except ValidationError as e:
             return Response({"error": str(e)}, status=400)
@@ -368,4 +568,21 @@ class StoreViewSet(viewsets.ViewSet):
             
             if settings.DEBUG:
                 return Response(error_details, status=500)
-            return Response({"error": str(e)}, status=500) 
\ No newline at end of file
+            return Response({"error": str(e)}, status=500) 
+
+    @action(detail=False, methods=['get'], url_path='shipments/(?P<tracking_number>[^/]+)')
+    def shipment(self, request, tracking_number=None):
+        """Get the stored status and full event history of a shipment by tracking number"""
+        try:
+            shipment = stored_shipment(tracking_number)
+            if shipment is None:
+                return Response({"error": "No shipment found with this tracking number"}, status=404)
+            return Response(serialize_shipment(shipment))
+
+        except Exception as e:
+            error_details = format_exception()
+            logger.error(f"Error fetching shipment: {error_details}")
+
+            if settings.DEBUG:
+                return Response(error_details, status=500)
+            return Response({"error": str(e)}, status=500)
\ No newline at end of file
@@ -0,0 +1,88 @@
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from django.conf import settings
+import base64
+import hashlib
+import hmac
+import json
+import logging
+
+from api.utils.shopify import init_shopify
+from api.utils.mirror import delete_products, refresh_inventory_quantity, upsert_products
+from api.utils.orders import index_orders
+from api.utils.shipments import record_fulfillment, record_order_shipments
+from api.views.store import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+def verify_shopify_hmac(body, signature):
+    """Check a webhook body against its X-Shopify-Hmac-Sha256 header"""
+    secret = settings.SHOPIFY_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+
+def handle_product_upsert(payload):
+    return upsert_products([payload]) > 0
+
+def handle_product_delete(payload):
+    return delete_products([payload["id"]]) > 0
+
+def handle_inventory_level_update(payload):
+    init_shopify()
+    return refresh_inventory_quantity(payload["inventory_item_id"])
+
+def handle_order_upsert(payload):
+    index_orders([payload])
+    record_order_shipments([payload])
+    return False
+
+def handle_fulfillment_upsert(payload):
+    record_fulfillment(payload)
+    return False
+
+# Topic -> handler(payload); a handler returns True if the served catalog changed
+WEBHOOK_HANDLERS = {
+    'products/create': handle_product_upsert,
+    'products/update': handle_product_upsert,
+    'products/delete': handle_product_delete,
+    'inventory_levels/update': handle_inventory_level_update,
+    'orders/create': handle_order_upsert,
+    'orders/updated': handle_order_upsert,
+    'orders/fulfilled': handle_order_upsert,
+    'fulfillments/create': handle_fulfillment_upsert,
+    'fulfillments/update': handle_fulfillment_upsert,
+}
+
+@api_view(['POST'])
+@authentication_classes([])  # Shopify authenticates with the HMAC signature instead
+@permission_classes([AllowAny])
+def shopify_webhook(request):
+    """Apply a Shopify webhook to the local product mirror, order index or shipments"""
+    body = request.body
+    if not verify_shopify_hmac(body, request.headers.get('X-Shopify-Hmac-Sha256')):
+        logger.warning("Rejected Shopify webhook with an invalid signature")
+        return Response({"error": "Invalid signature"}, status=401)
+
+    topic = request.headers.get('X-Shopify-Topic')
+    handler = WEBHOOK_HANDLERS.get(topic)
+    if handler is None:
+        # Acknowledge so Shopify does not keep retrying topics we don't use
+        logger.info(f"Ignoring Shopify webhook topic {topic}")
+        return Response({"status": "ignored"})
+
+    try:
+        payload = json.loads(body)
+        if handler(payload):
+            catalog_cache.refresh_in_background(rerun=True)
+        logger.info(f"Applied Shopify webhook {topic}")
+        return Response({"status": "ok"})
+    except (ValueError, KeyError) as e:
+        logger.error(f"Malformed Shopify webhook {topic}: {e}")
+        return Response({"error": "Malformed payload"}, status=400)
+    except Exception as e:
+        # A 5xx makes Shopify retry the delivery with backoff
+        logger.error(f"Error applying Shopify webhook {topic}: {e}")
+        return Response({"error": str(e)}, status=500)
@@ -154,6 +154,10 @@ LOGGING = {
 }
 
 # Cache settings
+# 'default' is per-process. 'shared' lives in Postgres so every gunicorn worker
+# and Fly machine sees the same entries; api.utils.cache.TieredCache keeps a
+# small in-process L1 in front of it. Create its table with
+# `python manage.py createcachetable`.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -162,13 +166,116 @@ CACHES = {
         'OPTIONS': {
             'MAX_ENTRIES': 1000,  # Maximum number of items in cache
         }
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        }
     }
 }
 
+# In-process L1 size, and how often (seconds) each worker re-checks key generations
+CACHE_L1_MAX_ENTRIES = int(os.getenv('CACHE_L1_MAX_ENTRIES', 256))
+CACHE_GENERATION_TTL = float(os.getenv('CACHE_GENERATION_TTL', 2))
+
+# Seconds to reuse customer order lookups and calendar availability
+ORDERS_CACHE_TTL = int(os.getenv('ORDERS_CACHE_TTL', 60))
+CALENDAR_CACHE_TTL = int(os.getenv('CALENDAR_CACHE_TTL', 120))
+
+# Calendars are queried concurrently on one pool per process of CALENDAR_FETCH_WORKERS
+# threads. Each Google request times out after CALENDAR_REQUEST_TIMEOUT seconds, and
+# calendars that haven't answered CALENDAR_FANOUT_DEADLINE seconds into a request are
+# reported as failed instead of holding up the rest.
+CALENDAR_FETCH_WORKERS = int(os.getenv('CALENDAR_FETCH_WORKERS', 8))
+CALENDAR_REQUEST_TIMEOUT = float(os.getenv('CALENDAR_REQUEST_TIMEOUT', 5))
+CALENDAR_FANOUT_DEADLINE = float(os.getenv('CALENDAR_FANOUT_DEADLINE', 8))
+
+# Seconds to remember which Shopify customers a phone number belongs to, so
+# phone-only order lookups skip the customer search
+STORE_PHONE_CUSTOMER_TTL = int(os.getenv('STORE_PHONE_CUSTOMER_TTL', 24 * 60 * 60))
+
+# Variants with this many units or fewer are reported as running low
+STORE_LOW_STOCK_THRESHOLD = int(os.getenv('STORE_LOW_STOCK_THRESHOLD', 5))
+
+# Carrier tracking pages are scraped on one pool per process of this many threads
+# (which caps concurrent scrapes).
+TRACKING_FETCH_WORKERS = int(os.getenv('TRACKING_FETCH_WORKERS', 8))
+
+# The shipment refresher (manage.py refresh_shipments) checks up to
+# TRACKING_REFRESH_BATCH due shipments per pass. In-flight parcels are polled
+# between the min and max interval depending on how recently they moved, and
+# are dropped once delivered or TRACKING_REFRESH_MAX_AGE seconds old.
+TRACKING_REFRESH_BATCH = int(os.getenv('TRACKING_REFRESH_BATCH', 50))
+TRACKING_REFRESH_MIN_INTERVAL = int(os.getenv('TRACKING_REFRESH_MIN_INTERVAL', 15 * 60))
+TRACKING_REFRESH_MAX_INTERVAL = int(os.getenv('TRACKING_REFRESH_MAX_INTERVAL', 6 * 60 * 60))
+TRACKING_REFRESH_MAX_AGE = int(os.getenv('TRACKING_REFRESH_MAX_AGE', 30 * 24 * 60 * 60))
+
+# Seconds a cached tracking result stays fresh, by parsed status. Failed scrapes
+# are retried after TRACKING_ERROR_BACKOFF seconds, doubling per consecutive
+# failure up to TRACKING_ERROR_BACKOFF_MAX.
+TRACKING_DELIVERED_TTL = int(os.getenv('TRACKING_DELIVERED_TTL', 7 * 24 * 60 * 60))
+TRACKING_IN_TRANSIT_TTL = int(os.getenv('TRACKING_IN_TRANSIT_TTL', 15 * 60))
+TRACKING_UNKNOWN_TTL = int(os.getenv('TRACKING_UNKNOWN_TTL', 5 * 60))
+TRACKING_ERROR_BACKOFF = int(os.getenv('TRACKING_ERROR_BACKOFF', 60))
+TRACKING_ERROR_BACKOFF_MAX = int(os.getenv('TRACKING_ERROR_BACKOFF_MAX', 60 * 60))
+
+# Outbound requests to third-party sites (carrier pages) share keep-alive pools.
+# Idempotent requests are retried this many times with backoff, and bodies larger
+# than OUTBOUND_HTTP_MAX_BODY_BYTES are rejected. A 429/503 whose Retry-After asks
+# for more than OUTBOUND_HTTP_MAX_RETRY_AFTER seconds is not retried.
+OUTBOUND_HTTP_RETRIES = int(os.getenv('OUTBOUND_HTTP_RETRIES', 2))
+OUTBOUND_HTTP_MAX_RETRY_AFTER = float(os.getenv('OUTBOUND_HTTP_MAX_RETRY_AFTER', 5))
+OUTBOUND_HTTP_MAX_BODY_BYTES = int(os.getenv('OUTBOUND_HTTP_MAX_BODY_BYTES', 2 * 1024 * 1024))
+
 # Shopify settings
 SHOPIFY_SHOP_URL = os.getenv('SHOPIFY_SHOP_URL')
 SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN')
 
+# Shopify API rate limiting (see api/utils/shopify_throttle.py): at most
+# SHOPIFY_MAX_CONCURRENCY calls per process run at once, fewer as the shop's
+# bucket fills. The REST bucket drains at SHOPIFY_REST_LEAK_RATE calls per second
+# (2 on standard plans, more on Advanced and Plus). Throttled calls are retried up to
+# SHOPIFY_MAX_RETRIES times, with a jittered backoff starting at SHOPIFY_RETRY_BACKOFF seconds.
+SHOPIFY_MAX_CONCURRENCY = int(os.getenv('SHOPIFY_MAX_CONCURRENCY', 4))
+SHOPIFY_REST_LEAK_RATE = float(os.getenv('SHOPIFY_REST_LEAK_RATE', 2))
+SHOPIFY_MAX_RETRIES = int(os.getenv('SHOPIFY_MAX_RETRIES', 4))
+SHOPIFY_RETRY_BACKOFF = float(os.getenv('SHOPIFY_RETRY_BACKOFF', 1))
+
+# Socket timeout (seconds) for each Shopify REST and GraphQL request, so a stalled
+# call fails instead of holding its thread (and any refresh lock it has) forever
+SHOPIFY_REQUEST_TIMEOUT = float(os.getenv('SHOPIFY_REQUEST_TIMEOUT', 30))
+
+# Seconds between full catalog resyncs; everything in between is incremental
+SHOPIFY_CATALOG_FULL_SYNC_INTERVAL = int(os.getenv('SHOPIFY_CATALOG_FULL_SYNC_INTERVAL', 6 * 60 * 60))
+
+# Threads used to fetch disjoint ID ranges during a full sync (1 = sequential pages)
+SHOPIFY_CATALOG_FETCH_WORKERS = int(os.getenv('SHOPIFY_CATALOG_FETCH_WORKERS', 4))
+
+# How the catalog is fetched from Shopify: 'rest' (full product payloads),
+# 'graphql' (only the fields we serve, paginated) or 'graphql_bulk' (like
+# 'graphql', but full syncs run as a bulk operation and stream its JSONL result)
+SHOPIFY_CATALOG_FETCHER = os.getenv('SHOPIFY_CATALOG_FETCHER', 'rest')
+
+# /api/store/products serves the cached catalog for STORE_CATALOG_SOFT_TTL seconds,
+# then keeps serving it as stale (while one background refresh runs) until
+# STORE_CATALOG_HARD_TTL, after which a request has to wait for Shopify.
+STORE_CATALOG_SOFT_TTL = int(os.getenv('STORE_CATALOG_SOFT_TTL', 5 * 60))
+STORE_CATALOG_HARD_TTL = int(os.getenv('STORE_CATALOG_HARD_TTL', 6 * 60 * 60))
+
+# Cache-Control max-age sent to storefront clients; after that they revalidate with If-None-Match
+STORE_CATALOG_MAX_AGE = int(os.getenv('STORE_CATALOG_MAX_AGE', 60))
+
+# Where catalog refreshes read products from: 'mirror' (the local Product/Variant
+# tables, kept current by Shopify webhooks) or 'shopify'. An empty mirror falls
+# back to Shopify until `manage.py backfill_products` has run.
+STORE_CATALOG_SOURCE = os.getenv('STORE_CATALOG_SOURCE', 'mirror')
+
+# Shared secret used to verify X-Shopify-Hmac-Sha256 on incoming webhooks
+SHOPIFY_WEBHOOK_SECRET = os.getenv('SHOPIFY_WEBHOOK_SECRET')
+
 # Security settings for production
 if not DEBUG:
     # SECURE_SSL_REDIRECT = True  # Comment this out to allow HTTP health checks
@@ -192,6 +299,35 @@ REST_FRAMEWORK = {
 ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY', 'dummy_key_for_build')
 DISCORD_WEBHOOK_URL = os.environ.get('DISCORD_WEBHOOK_URL', 'dummy_webhook_url_for_build')
 
+# Discord messages go through the notification outbox (see api/utils/notifications.py).
+# Each process's dispatcher delivers new ones right away, with up to DISCORD_QUEUE_SIZE
+# waiting (the outbox worker picks up any beyond that); each post times out after
+# DISCORD_SEND_TIMEOUT seconds, and a shutting-down process spends up to
+# DISCORD_DRAIN_TIMEOUT seconds delivering the rest.
+DISCORD_QUEUE_SIZE = int(os.getenv('DISCORD_QUEUE_SIZE', 100))
+DISCORD_SEND_TIMEOUT = float(os.getenv('DISCORD_SEND_TIMEOUT', 10))
+DISCORD_DRAIN_TIMEOUT = float(os.getenv('DISCORD_DRAIN_TIMEOUT', 10))
+
+# Posts that are rate limited (429) are retried after Discord's retry_after up to
+# DISCORD_RATE_LIMIT_RETRIES times before the outbox's backoff takes over.
+DISCORD_RATE_LIMIT_RETRIES = int(os.getenv('DISCORD_RATE_LIMIT_RETRIES', 3))
+
+# Issues with a severity in DISCORD_DIGEST_SEVERITIES are not posted one by one but
+# collected into a digest sent every DISCORD_DIGEST_INTERVAL seconds (0 posts them at
+# once). A digest carries up to NOTIFICATION_DIGEST_MAX notifications.
+DISCORD_DIGEST_INTERVAL = int(os.getenv('DISCORD_DIGEST_INTERVAL', 5 * 60))
+DISCORD_DIGEST_SEVERITIES = [s.strip().upper() for s in os.getenv('DISCORD_DIGEST_SEVERITIES', 'LOW,MEDIUM').split(',') if s.strip()]
+
+# The outbox worker (manage.py deliver_notifications) delivers up to
+# NOTIFICATION_DELIVERY_BATCH notifications per pass. Failed deliveries are retried
+# after NOTIFICATION_RETRY_BACKOFF seconds, doubling per attempt up to
+# NOTIFICATION_RETRY_BACKOFF_MAX, and given up after NOTIFICATION_MAX_ATTEMPTS.
+NOTIFICATION_DELIVERY_BATCH = int(os.getenv('NOTIFICATION_DELIVERY_BATCH', 20))
+NOTIFICATION_RETRY_BACKOFF = int(os.getenv('NOTIFICATION_RETRY_BACKOFF', 30))
+NOTIFICATION_RETRY_BACKOFF_MAX = int(os.getenv('NOTIFICATION_RETRY_BACKOFF_MAX', 60 * 60))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', 10))
+NOTIFICATION_DIGEST_MAX = int(os.getenv('NOTIFICATION_DIGEST_MAX', 500))
+
 # Google OAuth2 settings
 GOOGLE_OAUTH_CONFIG = {
     "web": {
@@ -16,10 +16,6 @@ django.setup()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Shopify
-from api.utils.shopify import init_shopify
-init_shopify()
-
 # Create FastAPI app
 app = FastAPI(
     title="UMI API",
@@ -0,0 +1,101 @@
+"""
+Benchmark catalog fetch strategies against a fake Shopify serving 10k products.
+
+Usage: python scripts/bench_catalog_fetch.py [--products 10000] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+import logging
+logging.disable(logging.INFO)
+
+import shopify
+from shopify import PaginatedIterator
+
+from api.utils.catalog import serialize_product
+from api.utils.shopify import fetch_products_page, iter_product_pages, iter_product_pages_parallel
+from fake_shopify import FakeShopify
+
+
+def single_find():
+    """What get_products used to do: one find() call, first page only"""
+    return [serialize_product(p.to_dict()) for p in shopify.Product.find(status='active')]
+
+
+def resource_pages():
+    """ActiveResource pagination: every product materialized as an object"""
+    products = []
+    for page in PaginatedIterator(shopify.Product.find(status='active', limit=250)):
+        products.extend(serialize_product(p.to_dict()) for p in page)
+    return products
+
+
+def sequential_pages():
+    products = []
+    products_page, next_url = fetch_products_page(status='active', limit=250)
+    while True:
+        products.extend(serialize_product(p) for p in products_page)
+        if not next_url:
+            return products
+        products_page, next_url = fetch_products_page(next_url)
+
+
+def prefetched_pages():
+    products = []
+    for page in iter_product_pages(status='active'):
+        products.extend(serialize_product(p) for p in page)
+    return products
+
+
+def parallel_ranges(workers):
+    def run():
+        products = []
+        for page in iter_product_pages_parallel(max_workers=workers, status='active'):
+            products.extend(serialize_product(p) for p in page)
+        return products
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Simulated Shopify latency per request, in seconds')
+    parser.add_argument('--per-kb-latency', type=float, default=0.002,
+                        help='Additional simulated latency per KB of response body')
+    args = parser.parse_args()
+
+    strategies = [
+        ('single find() (old)', single_find),
+        ('ActiveResource pages', resource_pages),
+        ('sequential pages', sequential_pages),
+        ('prefetched pages', prefetched_pages),
+        ('parallel ranges x4', parallel_ranges(4)),
+        ('parallel ranges x8', parallel_ranges(8)),
+    ]
+
+    with FakeShopify(args.products, latency=args.latency,
+                     per_kb_latency=args.per_kb_latency) as shop:
+        shop.activate()
+        print(f"{'Strategy':<24} {'Products':>9} {'Requests':>9} {'MB':>8} {'Seconds':>9}")
+        print('-' * 63)
+        for name, fetch in strategies:
+            shop.reset_counters()
+            started = time.perf_counter()
+            products = fetch()
+            elapsed = time.perf_counter() - started
+            megabytes = shop.bytes_sent / 1024 / 1024
+            print(f"{name:<24} {len(products):>9} {shop.request_count:>9} "
+                  f"{megabytes:>8.1f} {elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
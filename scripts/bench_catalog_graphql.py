@@ -0,0 +1,90 @@
+"""
+Compare the REST and GraphQL catalog fetchers against a fake Shopify.
+
+Reports bytes downloaded from the shop, wall time and peak Python memory
+(tracemalloc) for a full fetch + serialize of the active catalog.
+
+Usage: python scripts/bench_catalog_graphql.py [--products 10000] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+import logging
+logging.disable(logging.INFO)
+
+import shopify
+from shopify import PaginatedIterator
+
+from api.utils.catalog import serialize_product
+from api.utils.shopify import iter_product_pages, iter_product_pages_parallel
+from api.utils.shopify_graphql import iter_bulk_product_pages, iter_graphql_product_pages
+from fake_shopify import FakeShopify
+
+
+def resource_pages():
+    """The original path: ActiveResource objects for every product attribute"""
+    products = []
+    for page in PaginatedIterator(shopify.Product.find(status='active', limit=250)):
+        products.extend(serialize_product(p.to_dict()) for p in page)
+    return products
+
+
+def collect(pages):
+    def run():
+        products = []
+        for page in pages():
+            products.extend(serialize_product(p) for p in page)
+        return products
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Simulated Shopify latency per request, in seconds')
+    parser.add_argument('--per-kb-latency', type=float, default=0.002,
+                        help='Additional simulated latency per KB of response body')
+    parser.add_argument('--bulk-seconds-per-1k', type=float, default=1.0,
+                        help='Simulated time for a bulk operation to finish, per 1000 products')
+    args = parser.parse_args()
+
+    strategies = [
+        ('REST ActiveResource', resource_pages),
+        ('REST raw pages', collect(lambda: iter_product_pages(status='active'))),
+        ('REST parallel x4', collect(lambda: iter_product_pages_parallel(max_workers=4, status='active'))),
+        ('GraphQL pages', collect(lambda: iter_graphql_product_pages(status='active'))),
+        ('GraphQL bulk', collect(lambda: iter_bulk_product_pages(status='active'))),
+    ]
+
+    with FakeShopify(args.products, latency=args.latency, per_kb_latency=args.per_kb_latency,
+                     bulk_seconds_per_1k=args.bulk_seconds_per_1k) as shop:
+        shop.activate()
+        print(f"{'Strategy':<22} {'Products':>9} {'Requests':>9} {'MB':>8} {'Seconds':>9} {'Peak MB':>9}")
+        print('-' * 71)
+        for name, fetch in strategies:
+            shop.reset_counters()
+            tracemalloc.start()
+            started = time.perf_counter()
+            products = fetch()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            count = len(products)
+            del products  # keep the next strategy's peak independent of this result
+            megabytes = shop.bytes_sent / 1024 / 1024
+            print(f"{name:<22} {count:>9} {shop.request_count:>9} "
+                  f"{megabytes:>8.1f} {elapsed:>9.2f} {peak / 1024 / 1024:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Compare bare requests.get with the pooled outbound session against a stub HTTPS server.
+
+The stub uses a throwaway self-signed certificate and adds a simulated
+network round trip: two RTTs for every new connection (TCP + TLS 1.3
+handshake) and one per request, so handshake savings show up the way they
+would against a remote carrier.
+
+Usage: python scripts/bench_outbound_http.py [--requests 200] [--threads 8] [--rtt 0.03]
+"""
+import argparse
+import datetime
+import ipaddress
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from api.utils import http
+
+PAGE = b'<html><body>' + b'<p>Package in transit</p>' * 400 + b'</body></html>'
+
+
+def write_self_signed_cert(directory):
+    """Write a cert/key pair for 127.0.0.1 and return (cert_path, key_path)"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address('127.0.0.1'))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, 'cert.pem')
+    key_path = os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cert_path, key_path, rtt):
+        self.rtt = rtt
+        self.connections = 0
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), self._handler_class())
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+
+    def process_request_thread(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        time.sleep(2 * self.rtt)  # TCP + TLS handshake round trips
+        request.do_handshake()
+        super().process_request_thread(request, client_address)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(server.rtt)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(PAGE)))
+                self.end_headers()
+                self.wfile.write(PAGE)
+
+        return Handler
+
+
+def run(fetch, url, count, threads):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: fetch(url), range(count)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rtt', type=float, default=0.03,
+                        help='Simulated network round trip, in seconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = write_self_signed_cert(directory)
+        server = StubServer(cert_path, key_path, args.rtt)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'https://127.0.0.1:{server.server_address[1]}/track'
+
+        strategies = [
+            ('requests.get', lambda u: requests.get(u, timeout=10, verify=cert_path).raise_for_status()),
+            ('pooled session', lambda u: http.outbound_get(u, timeout=10, verify=cert_path).raise_for_status()),
+        ]
+
+        print(f"{'Client':<16} {'Threads':>8} {'Requests':>9} {'Handshakes':>11} {'Seconds':>9} {'ms/req':>8}")
+        print('-' * 66)
+        for threads in sorted({1, args.threads}):
+            for name, fetch in strategies:
+                server.connections = 0
+                elapsed = run(fetch, url, args.requests, threads)
+                print(f"{name:<16} {threads:>8} {args.requests:>9} {server.connections:>11} "
+                      f"{elapsed:>9.2f} {elapsed / args.requests * 1000 * threads:>8.1f}")
+
+        stats = http.connection_stats()
+        print(f"\nPooled session: {stats['requests']} requests over {stats['connections']} connections")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
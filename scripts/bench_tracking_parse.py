@@ -0,0 +1,83 @@
+"""
+Time tracking page parsing: the carrier extractors vs the old full-page
+BeautifulSoup get_text() + keyword scan.
+
+Pages come from scripts/fixtures/tracking. They are representative
+carrier pages trimmed to the markup the extractors read, so by default each
+is padded to a realistic size with inline CSS/JS and menu markup before and
+after the tracking content (--page-kb 0 parses them as saved).
+
+Usage: python scripts/bench_tracking_parse.py [--page-kb 400] [--runs 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from api.utils.carriers import classify_tracking_text, extract_tracking
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'tracking')
+
+# Fixture -> (tracking URL it was served from, expected status, expected ETA)
+PAGES = {
+    'usps.html': ('https://tools.usps.com/go/TrackConfirmAction?tLabels=9400100000000000000000',
+                  'in_transit', 'Friday, October 16, 2026 by 9:00pm'),
+    'generic_ldjson.html': ('https://track.example-parcel.com/RP000000001',
+                            'in_transit', '2026-10-15T18:00:00-07:00'),
+    'generic_text.html': ('https://parcels.example.net/t/LP00000000001', 'in_transit', None),
+}
+
+
+def pad(html, size):
+    """Grow a page to about size bytes, half before the tracking content and half after"""
+    if size <= len(html):
+        return html
+    half = (size - len(html)) // 2
+    asset = '<script>' + ('window.__bundle.push(function(){return "module";});\n' * (half // 100)) + '</script>\n'
+    menu = '<ul class="mega-menu">' + ('<li><a href="/category">Category link</a></li>\n' * (half // 100)) + '</ul>\n'
+    head, body = html.split('<body>', 1)
+    return head + asset + '<body>' + menu + body.replace('</body>', menu + asset + '</body>', 1)
+
+
+def old_parse(url, html):
+    text = BeautifulSoup(html, 'html.parser').get_text()
+    return {'status': classify_tracking_text(text), 'content': text[:1000]}
+
+
+def timed(parse, url, html, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        result = parse(url, html)
+    return (time.perf_counter() - started) / runs, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-kb', type=int, default=400, help='Pad each page to this size (0 = as saved)')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'Page':<22} {'KB':>6} {'get_text ms':>12} {'extract ms':>11} {'Speedup':>8}  "
+          f"{'Old status':<11} {'New status':<11} ETA")
+    print('-' * 110)
+    for name, (url, status, eta) in PAGES.items():
+        with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+            html = pad(f.read(), args.page_kb * 1024)
+
+        old_seconds, old = timed(old_parse, url, html, args.runs)
+        new_seconds, new = timed(extract_tracking, url, html, args.runs)
+        assert new['status'] == status and new['eta'] == eta, (name, new)
+
+        print(f"{name:<22} {len(html) / 1024:>6.0f} {old_seconds * 1000:>12.2f} {new_seconds * 1000:>11.3f} "
+              f"{old_seconds / new_seconds:>7.0f}x  {old['status']:<11} {new['status']:<11} {new['eta']}")
+        if new['last_event']:
+            event = new['last_event']
+            print(f"{'':<22} last event: {event['description']} ({event['location']}, {event['time']})")
+
+
+if __name__ == '__main__':
+    main()
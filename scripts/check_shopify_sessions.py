@@ -0,0 +1,113 @@
+"""
+Hammer the shared Shopify session from many threads at once against a fake Shopify.
+
+Each worker thread activates the process session with init_shopify() and
+then does a REST page fetch, an ActiveResource find or a GraphQL query,
+checking that it got the product it asked for. A churn thread meanwhile
+keeps activating and clearing a session with a bad token on its own
+thread; if that ever leaked into the workers' requests the fake shop
+would answer them with 401s.
+
+Usage: python scripts/check_shopify_sessions.py [--threads 32] [--iterations 25]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+import logging
+logging.disable(logging.INFO)
+
+import shopify
+
+from api.utils.shopify import configure_shopify, fetch_page, init_shopify
+from api.utils.shopify_graphql import PRODUCT_VARIANTS_QUERY, execute
+from fake_shopify import API_VERSION, FakeShopify
+
+TOKEN = 'fake-token'
+
+
+def rest_lookup(product):
+    items, _ = fetch_page('products', ids=str(product['id']), fields='id,title')
+    return items[0]['id']
+
+
+def resource_lookup(product):
+    return shopify.Product.find(ids=product['id'])[0].id
+
+
+def graphql_lookup(product):
+    data = execute(PRODUCT_VARIANTS_QUERY, {
+        'id': product['admin_graphql_api_id'], 'first': 100, 'after': None,
+    }, 'ProductVariants')
+    # The fake shop numbers variants <product id * 10 + n>
+    return int(data['product']['variants']['nodes'][0]['legacyResourceId']) // 10
+
+
+LOOKUPS = [rest_lookup, resource_lookup, graphql_lookup]
+
+
+def churn(shop, stop):
+    """Activate and clear a wrong-token session on this thread until stopped"""
+    session = shopify.Session(shop.base_url.split('//', 1)[1], API_VERSION, 'wrong-token')
+    while not stop.is_set():
+        shopify.ShopifyResource.activate_session(session)
+        shopify.ShopifyResource.clear_session()
+        time.sleep(0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=25, help='Lookups per thread')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.01)
+    args = parser.parse_args()
+
+    with FakeShopify(args.products, latency=args.latency, per_kb_latency=0, access_token=TOKEN) as shop:
+        configure_shopify(shop.site, shop.base_url.split('//', 1)[1], API_VERSION, TOKEN)
+        results = {'ok': 0, 'wrong': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(args.iterations):
+                product = rng.choice(shop.products)
+                lookup = rng.choice(LOOKUPS)
+                init_shopify()
+                try:
+                    outcome = 'ok' if lookup(product) == product['id'] else 'wrong'
+                except Exception as e:
+                    outcome = 'failed'
+                    print(f"{lookup.__name__}: {type(e).__name__}: {e}")
+                with lock:
+                    results[outcome] += 1
+
+        stop = threading.Event()
+        churner = threading.Thread(target=churn, args=(shop, stop), daemon=True)
+        churner.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(executor.map(worker, range(args.threads)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        churner.join()
+
+        total = args.threads * args.iterations
+        print(f"{args.threads} threads x {args.iterations} lookups in {elapsed:.2f}s: "
+              f"{results['ok']}/{total} ok, {results['wrong']} wrong product, {results['failed']} failed, "
+              f"{shop.unauthorized_count} unauthorized requests at the shop")
+        sys.exit(0 if results['ok'] == total else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+"""
+Minimal stand-in for the Shopify Admin REST API, used by the benchmark scripts.
+
+Serves a generated catalog from /admin/api/<version>/products.json with
+cursor (page_info) pagination, `ids`, `fields`, `status` and `updated_at_min`
+filters, and adds a latency that grows with the response size (as Shopify's
+does) so fetch strategies can be compared without touching the real shop.
+
+/admin/api/<version>/graphql.json answers the catalog's own GraphQL
+operations (matched by operation name, not parsed), including bulk
+operations whose JSONL result is served from /bulk/<id>.jsonl.
+
+With access_token set, requests without that X-Shopify-Access-Token get a
+401 (and are counted), so a client sending the wrong session shows up.
+
+With rest_bucket=(size, leak_rate), REST calls are metered by a leaky bucket
+like Shopify's: X-Shopify-Shop-Api-Call-Limit reports its level, and calls
+made with it full get a 429 with Retry-After.
+"""
+import base64
+import json
+import multiprocessing
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+API_VERSION = '2023-04'
+
+
+def make_catalog(count, variants_per_product=3, images_per_product=2):
+    """
+    Generate `count` deterministic products shaped like Shopify's REST payload.
+
+    Besides the fields the catalog serves, products carry the images, options
+    and variant attributes real REST responses include, so byte counts are
+    representative.
+    """
+    products = []
+    timestamp = '2024-01-01T00:00:00-05:00'
+    for i in range(count):
+        product_id = 7000000000 + i
+        images = [
+            {
+                'id': product_id * 100 + n,
+                'alt': None,
+                'position': n + 1,
+                'product_id': product_id,
+                'created_at': timestamp,
+                'updated_at': timestamp,
+                'admin_graphql_api_id': f'gid://shopify/ProductImage/{product_id * 100 + n}',
+                'width': 2048,
+                'height': 2048,
+                'src': f'https://cdn.shopify.com/s/files/1/0000/0001/products/product-{i}-{n}.jpg?v=1704085200',
+                'variant_ids': [],
+            }
+            for n in range(images_per_product)
+        ]
+        products.append({
+            'id': product_id,
+            'title': f'Product {i}',
+            'body_html': '<p>' + ('Hand made in Brooklyn. ' * 20) + '</p>',
+            'vendor': f'Vendor {i % 17}',
+            'product_type': f'Type {i % 9}',
+            'created_at': timestamp,
+            'updated_at': timestamp,
+            'published_at': timestamp,
+            'handle': f'product-{i}',
+            'template_suffix': '',
+            'published_scope': 'web',
+            'tags': f'tag-{i % 5}, tag-{i % 11}',
+            'status': 'active',
+            'admin_graphql_api_id': f'gid://shopify/Product/{product_id}',
+            'variants': [
+                {
+                    'id': product_id * 10 + v,
+                    'product_id': product_id,
+                    'title': f'Size {v}',
+                    'sku': f'SKU-{i}-{v}',
+                    'price': '25.00',
+                    'compare_at_price': None,
+                    'position': v + 1,
+                    'inventory_policy': 'deny',
+                    'fulfillment_service': 'manual',
+                    'inventory_management': 'shopify',
+                    'option1': f'Size {v}',
+                    'option2': None,
+                    'option3': None,
+                    'created_at': timestamp,
+                    'updated_at': timestamp,
+                    'taxable': True,
+                    'barcode': '',
+                    'grams': 450,
+                    'image_id': None,
+                    'weight': 0.45,
+                    'weight_unit': 'kg',
+                    'inventory_item_id': product_id * 10 + v + 5000000000,
+                    'inventory_quantity': (i + v) % 12,
+                    'old_inventory_quantity': (i + v) % 12,
+                    'requires_shipping': True,
+                    'admin_graphql_api_id': f'gid://shopify/ProductVariant/{product_id * 10 + v}',
+                }
+                for v in range(variants_per_product)
+            ],
+            'options': [
+                {
+                    'id': product_id * 10,
+                    'product_id': product_id,
+                    'name': 'Size',
+                    'position': 1,
+                    'values': [f'Size {v}' for v in range(variants_per_product)],
+                },
+            ],
+            'images': images,
+            'image': images[0] if images else None,
+        })
+    return products
+
+
+def graphql_product(product):
+    """Render a REST product as the GraphQL node fields the catalog queries request"""
+    return {
+        'id': product['admin_graphql_api_id'],
+        'legacyResourceId': str(product['id']),
+        'title': product['title'],
+        'descriptionHtml': product['body_html'],
+        'vendor': product['vendor'],
+        'productType': product['product_type'],
+        'tags': [tag.strip() for tag in product['tags'].split(',') if tag.strip()],
+        'handle': product['handle'],
+        'status': product['status'].upper(),
+        'publishedAt': product['published_at'],
+        'updatedAt': product['updated_at'],
+    }
+
+
+def graphql_variant(variant):
+    return {
+        'legacyResourceId': str(variant['id']),
+        'title': variant['title'],
+        'sku': variant['sku'],
+        'price': variant['price'],
+        'compareAtPrice': variant['compare_at_price'],
+        'position': variant['position'],
+        'inventoryQuantity': variant['inventory_quantity'],
+        'inventoryItem': {
+            'legacyResourceId': str(variant['inventory_item_id']),
+            'requiresShipping': variant['requires_shipping'],
+        },
+    }
+
+
+def parse_search_query(query):
+    """Turn the search syntax the catalog fetchers use back into REST-style filters"""
+    filters = {}
+    for term in (query or '').split(' AND '):
+        if term.startswith('status:'):
+            filters['status'] = term[len('status:'):]
+        elif term.startswith("updated_at:>="):
+            filters['updated_at_min'] = term[len("updated_at:>="):].strip("'")
+    return filters
+
+
+def encode_offset(offset):
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def decode_offset(cursor):
+    return int(base64.urlsafe_b64decode(cursor)) if cursor else 0
+
+
+class FakeShopify:
+    """
+    Run a fake shop in a child process: `with FakeShopify(10000) as shop:`
+
+    The server lives in its own process so its JSON encoding does not compete
+    with the client under test for the GIL.
+    """
+
+    def __init__(self, product_count=10000, latency=0.05, per_kb_latency=0.002,
+                 bulk_seconds_per_1k=1.0, rest_bucket=None, access_token=None):
+        self.products = make_catalog(product_count)
+        self.products_by_gid = {p['admin_graphql_api_id']: p for p in self.products}
+        self.latency = latency
+        self.per_kb_latency = per_kb_latency
+        self.bulk_seconds_per_1k = bulk_seconds_per_1k
+        self.bulk_operations = {}
+        self.rest_bucket = rest_bucket
+        self.access_token = access_token
+        self._unauthorized_count = multiprocessing.Value('i', 0)
+        self.bucket_level = 0.0
+        self.bucket_updated = time.monotonic()
+        self.bucket_lock = threading.Lock()
+        self._throttled_count = multiprocessing.Value('i', 0)
+        self._request_count = multiprocessing.Value('i', 0)
+        self._bytes_sent = multiprocessing.Value('q', 0)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.process = multiprocessing.get_context('fork').Process(
+            target=self.server.serve_forever, daemon=True)
+
+    @property
+    def request_count(self):
+        return self._request_count.value
+
+    @property
+    def unauthorized_count(self):
+        return self._unauthorized_count.value
+
+    @property
+    def throttled_count(self):
+        return self._throttled_count.value
+
+    @property
+    def bytes_sent(self):
+        return self._bytes_sent.value
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def site(self):
+        return f'{self.base_url}/admin/api/{API_VERSION}'
+
+    def activate(self):
+        """Point ShopifyResource at this fake shop on the calling thread"""
+        import shopify
+        shopify.ShopifyResource.site = self.site
+        shopify.ShopifyResource.url = self.base_url
+        shopify.ShopifyResource.version = API_VERSION
+        shopify.ShopifyResource.headers['X-Shopify-Access-Token'] = 'fake-token'
+
+    def reset_counters(self):
+        with self._request_count.get_lock():
+            self._request_count.value = 0
+        with self._bytes_sent.get_lock():
+            self._bytes_sent.value = 0
+        with self._throttled_count.get_lock():
+            self._throttled_count.value = 0
+
+    def take_from_bucket(self):
+        """Count a REST call against the bucket; returns (allowed, call limit header value)"""
+        size, leak_rate = self.rest_bucket or (40, None)
+        if not leak_rate:
+            return True, f'1/{size}'
+        with self.bucket_lock:
+            now = time.monotonic()
+            self.bucket_level = max(self.bucket_level - (now - self.bucket_updated) * leak_rate, 0.0)
+            self.bucket_updated = now
+            if self.bucket_level + 1 > size:
+                return False, f'{size}/{size}'
+            self.bucket_level += 1
+            return True, f'{int(self.bucket_level + 0.999)}/{size}'
+
+    def __enter__(self):
+        self.process.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+        self.server.server_close()
+
+    def _filter_products(self, params):
+        products = self.products
+        if 'ids' in params:
+            wanted = {int(i) for i in params['ids'].split(',') if i}
+            products = [p for p in products if p['id'] in wanted]
+        if 'status' in params:
+            products = [p for p in products if p['status'] == params['status']]
+        if 'updated_at_min' in params:
+            products = [p for p in products if p['updated_at'] >= params['updated_at_min']]
+        return products
+
+    def products_page(self, params):
+        """Return (payload, next_page_params) for a products.json request"""
+        limit = min(int(params.get('limit', 50)), 250)
+        if 'page_info' in params:
+            cursor = json.loads(base64.urlsafe_b64decode(params['page_info']))
+            filters, offset = cursor['filters'], cursor['offset']
+            fields = params.get('fields', cursor.get('fields'))
+        else:
+            filters = {k: v for k, v in params.items() if k not in ('limit', 'fields')}
+            offset = 0
+            fields = params.get('fields')
+
+        products = self._filter_products(filters)
+        page = products[offset:offset + limit]
+        if fields:
+            keep = fields.split(',')
+            page = [{k: p[k] for k in keep if k in p} for p in page]
+
+        next_params = None
+        if offset + limit < len(products):
+            token = json.dumps({'filters': filters, 'offset': offset + limit, 'fields': fields})
+            next_params = {
+                'limit': limit,
+                'page_info': base64.urlsafe_b64encode(token.encode()).decode(),
+            }
+        return {'products': page}, next_params
+
+    def graphql(self, request):
+        """Return the response payload for one of the catalog's GraphQL operations"""
+        operation = request.get('operationName')
+        variables = request.get('variables') or {}
+
+        if operation == 'CatalogPage':
+            products = self._filter_products(parse_search_query(variables.get('query')))
+            offset = decode_offset(variables.get('after'))
+            page = products[offset:offset + variables['first']]
+            has_next = offset + variables['first'] < len(products)
+            nodes = []
+            for product in page:
+                variants = product['variants'][:variables['variantsFirst']]
+                more = len(product['variants']) > len(variants)
+                nodes.append(dict(graphql_product(product), variants={
+                    'pageInfo': {'hasNextPage': more, 'endCursor': encode_offset(len(variants))},
+                    'nodes': [graphql_variant(v) for v in variants],
+                }))
+            return {'data': {'products': {
+                'pageInfo': {'hasNextPage': has_next, 'endCursor': encode_offset(offset + len(page))},
+                'nodes': nodes,
+            }}}
+
+        if operation == 'ProductVariants':
+            product = self.products_by_gid[variables['id']]
+            offset = decode_offset(variables.get('after'))
+            variants = product['variants'][offset:offset + variables['first']]
+            has_next = offset + len(variants) < len(product['variants'])
+            return {'data': {'product': {'variants': {
+                'pageInfo': {'hasNextPage': has_next, 'endCursor': encode_offset(offset + len(variants))},
+                'nodes': [graphql_variant(v) for v in variants],
+            }}}}
+
+        if operation == 'BulkCatalog':
+            match = re.search(r'products\(query: ("(?:[^"\\]|\\.)*")\)', variables['query'])
+            filters = parse_search_query(json.loads(match.group(1))) if match else {}
+            operation_id = f'gid://shopify/BulkOperation/{len(self.bulk_operations) + 1}'
+            self.bulk_operations[operation_id] = {'started': time.monotonic(), 'filters': filters}
+            return {'data': {'bulkOperationRunQuery': {
+                'bulkOperation': {'id': operation_id, 'status': 'CREATED'},
+                'userErrors': [],
+            }}}
+
+        if operation == 'CurrentBulkOperation':
+            operation_id = list(self.bulk_operations)[-1]
+            bulk = self.bulk_operations[operation_id]
+            products = self._filter_products(bulk['filters'])
+            duration = self.bulk_seconds_per_1k * len(products) / 1000
+            done = time.monotonic() - bulk['started'] >= duration
+            return {'data': {'currentBulkOperation': {
+                'id': operation_id,
+                'status': 'COMPLETED' if done else 'RUNNING',
+                'errorCode': None,
+                'objectCount': str(len(products) * 4) if done else '0',
+                'url': f'{self.base_url}/bulk/{operation_id.rsplit("/", 1)[-1]}.jsonl' if done else None,
+            }}}
+
+        return {'errors': [{'message': f'Unknown operation {operation}'}]}
+
+    def bulk_result(self, number):
+        """Render a bulk operation result as JSONL: each product line followed by its variants"""
+        bulk = self.bulk_operations[f'gid://shopify/BulkOperation/{number}']
+        lines = []
+        for product in self._filter_products(bulk['filters']):
+            lines.append(json.dumps(graphql_product(product)))
+            for variant in product['variants']:
+                lines.append(json.dumps(dict(graphql_variant(variant),
+                                             __parentId=product['admin_graphql_api_id'])))
+        return ('\n'.join(lines) + '\n').encode()
+
+    def _handler_class(self):
+        shop = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def authorized(self):
+                if shop.access_token is None or self.headers.get('X-Shopify-Access-Token') == shop.access_token:
+                    return True
+                with shop._unauthorized_count.get_lock():
+                    shop._unauthorized_count.value += 1
+                body = json.dumps({'errors': '[API] Invalid API key or access token (unrecognized login or wrong password)'})
+                self.respond(body.encode(), 'application/json', {}, status=401)
+                return False
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if not url.path.startswith('/bulk/') and not self.authorized():
+                    return
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                resource = url.path.rsplit('/', 1)[-1]
+                if not url.path.startswith('/bulk/'):
+                    allowed, call_limit = shop.take_from_bucket()
+                    headers = {'X-Shopify-Shop-Api-Call-Limit': call_limit}
+                    if not allowed:
+                        with shop._throttled_count.get_lock():
+                            shop._throttled_count.value += 1
+                        body = json.dumps({'errors': 'Exceeded 2 calls per second for api client. '
+                                                     'Reduce request rates to resume uninterrupted service.'})
+                        self.respond(body.encode(), 'application/json', dict(headers, **{'Retry-After': '2.0'}),
+                                     status=429)
+                        return
+
+                if resource == 'products.json':
+                    payload, next_params = shop.products_page(params)
+                    if next_params:
+                        next_url = f'{shop.base_url}{url.path}?{urlencode(next_params)}'
+                        headers['Link'] = f'<{next_url}>; rel="next"'
+                elif resource == 'events.json':
+                    payload = {'events': []}
+                elif url.path.startswith('/bulk/'):
+                    body = shop.bulk_result(resource.split('.')[0])
+                    self.respond(body, 'application/jsonl', {})
+                    return
+                else:
+                    self.send_error(404)
+                    return
+
+                self.respond(json.dumps(payload).encode(), 'application/json', headers)
+
+            def do_POST(self):
+                if not self.path.endswith('/graphql.json'):
+                    self.send_error(404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if not self.authorized():
+                    return
+                result = shop.graphql(request)
+                # GraphQL calls are not metered here; report an always-full bucket
+                result['extensions'] = {'cost': {
+                    'requestedQueryCost': 10,
+                    'actualQueryCost': 10,
+                    'throttleStatus': {'maximumAvailable': 1000.0, 'currentlyAvailable': 1000, 'restoreRate': 50.0},
+                }}
+                self.respond(json.dumps(result).encode(), 'application/json', {})
+
+            def respond(self, body, content_type, headers, status=200):
+                time.sleep(shop.latency + shop.per_kb_latency * len(body) / 1024)
+                with shop._request_count.get_lock():
+                    shop._request_count.value += 1
+                with shop._bytes_sent.get_lock():
+                    shop._bytes_sent.value += len(body)
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler